@@ -0,0 +1,162 @@
+"""
+Local stand-ins for the OpenAI chat completions, Coqui TTS and Replicate APIs,
+used by benchmarks.pipeline so the whole generation pipeline can run without
+paying for (or waiting on) the real providers.
+
+Responses are deterministic and latencies are configurable:
+- chat completions return a five topic structure or a transcript of a fixed
+  number of rounds, streamed as server-sent events when asked to;
+- /api/tts returns a mono 16-bit WAV tone whose length follows the text, with
+  a limited number of concurrent syntheses like a GPU-bound server, and
+  optionally sheds load with a 503 once too many requests are waiting;
+- /v1/predictions answers "Prefer: wait" requests with a finished prediction
+  pointing at a generated PNG.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import math
+import struct
+import time
+from array import array
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from PIL import Image
+
+SAMPLE_RATE = 22050
+# Speech rate used to size the clips, roughly 150 words a minute
+CHARACTERS_PER_SECOND = 15
+CHARACTERS_PER_TOKEN = 4
+
+@dataclass
+class MockSettings:
+    rounds: int = 10
+    words_per_turn: int = 60
+    llm_latency: float = 0.5
+    llm_tokens_per_second: float = 80.0
+    tts_latency: float = 0.2
+    tts_realtime_factor: float = 0.1
+    tts_slots: int = 4
+    # Requests allowed to wait for a slot before the server answers 503, 0 for no limit
+    tts_queue_limit: int = 0
+    image_latency: float = 2.0
+
+def _tone(text: str, seconds: float) -> bytes:
+    """A WAV tone whose pitch is derived from the text, so clips are deterministic"""
+    frequency = 200 + int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:4], 16) % 400
+    period = max(1, SAMPLE_RATE // frequency)
+    cycle = array("h", (int(8000 * math.sin(2 * math.pi * k / period)) for k in range(period)))
+    frames = max(1, int(seconds * SAMPLE_RATE))
+    data = (cycle * (frames // period + 1))[:frames].tobytes()
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(data), b"WAVE",
+        b"fmt ", 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16,
+        b"data", len(data)
+    )
+    return header + data
+
+def _structure(prompt: str) -> dict:
+    return {
+        str(i): {"topic": f"Part {i} of {prompt[:40]}", "description": f"Episode {i} explores {prompt[:80]}."}
+        for i in range(1, 6)
+    }
+
+def _transcript(topic: str, settings: MockSettings) -> dict:
+    def turn(round_index: int, speaker: int) -> str:
+        words = [f"word{(round_index * 7 + speaker * 3 + k) % 97}" for k in range(settings.words_per_turn)]
+        return f"Round {round_index} on {topic[:40]}: " + " ".join(words) + "."
+
+    return {
+        "rounds": [
+            {"speaker0": turn(i, 0), "speaker1": turn(i, 1)}
+            for i in range(settings.rounds)
+        ]
+    }
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI()
+    tts_slots = asyncio.Semaphore(settings.tts_slots)
+    tts_waiting = 0
+    cover = io.BytesIO()
+    Image.new("RGB", (768, 768), (40, 90, 160)).save(cover, format="PNG")
+    cover_png = cover.getvalue()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        system_prompt = body["messages"][0]["content"]
+        user_prompt = body["messages"][-1]["content"]
+        if '"rounds"' in system_prompt:
+            content = json.dumps(_transcript(user_prompt, settings))
+        else:
+            content = json.dumps(_structure(user_prompt))
+
+        # Time to first token, then generation at a fixed token rate
+        generation_time = len(content) / CHARACTERS_PER_TOKEN / settings.llm_tokens_per_second
+        await asyncio.sleep(settings.llm_latency)
+
+        if not body.get("stream"):
+            await asyncio.sleep(generation_time)
+            return JSONResponse({"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+        async def events():
+            chunk_size = CHARACTERS_PER_TOKEN * 8
+            delay = generation_time * chunk_size / max(len(content), 1)
+            for start in range(0, len(content), chunk_size):
+                delta = {"choices": [{"delta": {"content": content[start:start + chunk_size]}}]}
+                yield f"data: {json.dumps(delta)}\n\n"
+                await asyncio.sleep(delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/")
+    async def index():
+        # What the TTS pool's health checks request
+        return Response("ok", media_type="text/plain")
+
+    @app.get("/api/tts")
+    async def tts(text: str, speaker_id: str = "", language_id: str = "en"):
+        nonlocal tts_waiting
+        seconds = max(len(text) / CHARACTERS_PER_SECOND, 0.1)
+        if settings.tts_queue_limit and tts_slots.locked() and tts_waiting >= settings.tts_queue_limit:
+            return JSONResponse({"detail": "Server overloaded"}, status_code=503)
+
+        tts_waiting += 1
+        try:
+            await tts_slots.acquire()
+        finally:
+            tts_waiting -= 1
+        try:
+            await asyncio.sleep(settings.tts_latency + seconds * settings.tts_realtime_factor)
+            audio = _tone(f"{speaker_id}:{text}", seconds)
+        finally:
+            tts_slots.release()
+        return Response(audio, media_type="audio/wav")
+
+    @app.post("/v1/predictions")
+    async def predictions(request: Request):
+        await asyncio.sleep(settings.image_latency)
+        prediction_id = hashlib.sha1(str(time.time_ns()).encode()).hexdigest()[:12]
+        base_url = str(request.base_url).rstrip("/")
+        return JSONResponse({
+            "id": prediction_id,
+            "status": "succeeded",
+            "output": [f"{base_url}/images/{prediction_id}.png"],
+            "urls": {"get": f"{base_url}/v1/predictions/{prediction_id}"}
+        }, status_code=201)
+
+    @app.get("/images/{name}")
+    async def image(name: str):
+        return Response(cover_png, media_type="image/png")
+
+    return app
+
+def serve(host: str, port: int, settings: MockSettings) -> None:
+    """Run the mock providers until the process is terminated"""
+    uvicorn.run(create_app(settings), host=host, port=port, log_level="warning", access_log=False)
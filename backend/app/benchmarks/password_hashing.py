@@ -0,0 +1,64 @@
+"""
+Password verification throughput, as done by /auth/login.
+
+Run from backend/app:
+    python -m benchmarks.password_hashing [--rounds 10 12 14] [--workers N] [--seconds 5]
+
+For each bcrypt cost it verifies the same password from an event loop through
+a thread pool, like utils.security does, and reports logins/sec overall and
+per core. Use it to pick BCRYPT_ROUNDS and PASSWORD_HASH_WORKERS for a host.
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+PASSWORD = "correct horse battery staple"
+
+async def measure(context: CryptContext, hashed: str, workers: int, seconds: float) -> int:
+    """Keep every worker busy verifying for the given time, return the number of verifications"""
+    loop = asyncio.get_running_loop()
+    deadline = time.perf_counter() + seconds
+    verified = 0
+
+    async def login_loop():
+        nonlocal verified
+        while time.perf_counter() < deadline:
+            assert await loop.run_in_executor(pool, context.verify, PASSWORD, hashed)
+            verified += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Twice as many callers as threads so the pool never waits on the loop
+        await asyncio.gather(*(login_loop() for _ in range(workers * 2)))
+    return verified
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[BCRYPT_ROUNDS])
+    parser.add_argument("--workers", type=int, default=PASSWORD_HASH_WORKERS)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f"{cores} cores, {args.workers} hashing threads, {args.seconds:g}s per cost")
+    print(f"{'rounds':>6} {'ms/hash':>9} {'logins/s':>10} {'logins/s/core':>14}")
+
+    for rounds in args.rounds:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        hashed = context.hash(PASSWORD)
+
+        start = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        single = time.perf_counter() - start
+
+        verified = await measure(context, hashed, args.workers, args.seconds)
+        rate = verified / args.seconds
+        print(f"{rounds:>6} {single * 1000:>9.1f} {rate:>10.1f} {rate / min(cores, args.workers):>14.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
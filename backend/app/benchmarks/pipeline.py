@@ -0,0 +1,217 @@
+"""
+End-to-end benchmark of the podcast generation pipeline against local mock
+providers (see benchmarks.mock_providers).
+
+Run from backend/app, with MONGODB_URL pointing at a MongoDB you can write to:
+    python -m benchmarks.pipeline --jobs 8 [--concurrency 4] [--rounds 10] [--tts-nodes 2]
+
+It starts the mocks in separate processes, points OPENAI_API_URL,
+COQUI_API_URL/TTS_BACKENDS and REPLICATE_API_URL at them, then runs
+generate_podcast_task for N podcasts in a scratch database and directory.
+It reports per-stage wall time, throughput in episodes per hour, peak RSS and
+what each provider limiter ended up allowing.
+The benchmark podcasts and files are removed afterwards.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+
+from benchmarks.mock_providers import MockSettings, serve
+
+STAGE_ORDER = ["cover_art", "structure", "series", "transcription", "audio", "assembly", "transcode"]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_until_up(url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{url}/images/ready.png", timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Mock provider at {url} did not start")
+
+def _start_mocks(settings: MockSettings, tts_nodes: int):
+    """One process for OpenAI, Replicate and the first TTS node, plus one per extra TTS node"""
+    processes, urls = [], []
+    for _ in range(max(1, tts_nodes)):
+        port = _free_port()
+        process = multiprocessing.Process(target=serve, args=("127.0.0.1", port, settings), daemon=True)
+        process.start()
+        processes.append(process)
+        urls.append(f"http://127.0.0.1:{port}")
+    for url in urls:
+        _wait_until_up(url)
+    return processes, urls
+
+def _configure_environment(args, urls) -> None:
+    """Point the app at the mocks. Must run before any app module is imported."""
+    os.environ["OPENAI_API_URL"] = f"{urls[0]}/v1/chat/completions"
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["REPLICATE_API_URL"] = f"{urls[0]}/v1"
+    os.environ["REPLICATE_API_TOKEN"] = "benchmark"
+    os.environ["COQUI_API_URL"] = urls[0]
+    # Dead nodes are free ports nothing listens on, to watch the TTS pool route around them
+    tts_urls = urls + [f"http://127.0.0.1:{_free_port()}" for _ in range(args.tts_dead_nodes)]
+    os.environ["TTS_BACKENDS"] = ",".join(f"{url}={args.tts_client_slots or args.tts_slots}" for url in tts_urls)
+    os.environ["TTS_CACHE_ENABLED"] = "true" if args.tts_cache else "false"
+    os.environ["LLM_STREAMING"] = "false" if args.no_streaming else "true"
+    os.environ["AUDIO_RENDITIONS"] = args.renditions
+    os.environ["SOFTWARE_NAME"] = args.database
+
+def _peak_rss_mb() -> tuple:
+    # ru_maxrss is in kilobytes on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+async def run_benchmark(args) -> None:
+    from database import close_db, init_db
+    from repositories import podcast_repo
+    from utils.http_client import close_clients
+    from utils.job_queue import enqueue_podcast
+    from utils.llm_parsing import parsing_stats
+    from utils.podcast_pipeline import generate_podcast_task
+    from utils.rate_limiter import limiter_stats
+    from utils.tts_cache import tts_cache
+    from utils.tts_pool import tts_pool
+
+    init_db()
+    podcast_ids = []
+    try:
+        for i in range(args.jobs):
+            podcast_ids.append(await enqueue_podcast("benchmark", f"Benchmark episode {i} about distributed systems", "en"))
+
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def run(podcast_id: str):
+            async with slots:
+                await generate_podcast_task(podcast_id)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run(podcast_id) for podcast_id in podcast_ids))
+        wall_time = time.perf_counter() - started
+
+        podcasts = [await podcast_repo.find_by_id(podcast_id) for podcast_id in podcast_ids]
+        _report(
+            args, podcasts, wall_time, parsing_stats(), limiter_stats(), tts_pool.stats(),
+            tts_cache.stats() if tts_cache else None
+        )
+    finally:
+        if podcast_ids and not args.keep:
+            await podcast_repo.collection.delete_many({"userID": "benchmark"})
+        await close_clients()
+        await close_db()
+
+def _report(
+    args, podcasts, wall_time: float, parsing: dict, limiters: dict, tts_nodes: dict, cache: Optional[dict]
+) -> None:
+    failed = [podcast for podcast in podcasts if podcast["status"] != "ready"]
+    audio_seconds = sum(podcast["cues"][-1]["end"] for podcast in podcasts if podcast.get("cues"))
+    own_rss, children_rss = _peak_rss_mb()
+
+    print(f"\n{args.jobs} jobs, {args.concurrency} concurrent, {args.rounds} rounds each")
+    print(f"{'stage':<14} {'mean s':>8} {'p50 s':>8} {'max s':>8}")
+    for stage in STAGE_ORDER:
+        timings = [podcast["stage_timings"][stage] for podcast in podcasts if stage in podcast.get("stage_timings", {})]
+        if timings:
+            print(f"{stage:<14} {statistics.mean(timings):>8.2f} {statistics.median(timings):>8.2f} {max(timings):>8.2f}")
+
+    print(f"\nwall time         {wall_time:.2f} s")
+    print(f"throughput        {len(podcasts) / wall_time * 3600:.1f} episodes/hour")
+    print(f"audio produced    {audio_seconds:.0f} s ({audio_seconds / wall_time:.1f}x realtime)")
+    print(f"peak RSS          {own_rss:.0f} MB (children {children_rss:.0f} MB)")
+    for kind, outcomes in parsing.items():
+        print(f"{kind + ' parse':<18}" + ", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items())))
+    for name, stats in limiters.items():
+        print(
+            f"limiter {name}: concurrency {stats['concurrency_limit']}, {stats['requests']} requests, "
+            f"{stats['congested']} congested, {stats['queued_seconds']:.1f} s queued"
+        )
+    for url, stats in tts_nodes.items():
+        print(
+            f"tts node {url}: {stats['requests']} requests, {stats['failures']} failed, "
+            f"{stats['ejections']} ejections, {stats['ms_per_character']} ms/character"
+        )
+    if cache:
+        print(
+            f"tts cache         {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%}), "
+            f"{cache['evictions']} evictions"
+        )
+    if failed:
+        print(f"failed            {len(failed)}: " + "; ".join(
+            f"{podcast['_id']} at {podcast.get('failed_stage')}: {podcast.get('error_message')}" for podcast in failed
+        ))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=4, help="Podcasts to generate")
+    parser.add_argument("--concurrency", type=int, default=None, help="Podcasts generated at once (default: all)")
+    parser.add_argument("--rounds", type=int, default=10, help="Transcript rounds per podcast")
+    parser.add_argument("--words-per-turn", type=int, default=60)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="Fixed seconds per TTS request")
+    parser.add_argument("--tts-realtime-factor", type=float, default=0.1, help="Synthesis seconds per audio second")
+    parser.add_argument("--tts-slots", type=int, default=4, help="Concurrent syntheses per TTS node")
+    parser.add_argument("--tts-nodes", type=int, default=1)
+    parser.add_argument("--tts-client-slots", type=int, default=0, help="TTS concurrency the app may use per node (default: --tts-slots)")
+    parser.add_argument("--tts-dead-nodes", type=int, default=0, help="Unreachable TTS nodes added to the pool")
+    parser.add_argument("--tts-queue-limit", type=int, default=0, help="Waiting requests before a TTS node answers 503")
+    parser.add_argument("--image-latency", type=float, default=2.0)
+    parser.add_argument("--renditions", default="mp3:96k,opus:48k", help='AUDIO_RENDITIONS, "" to skip transcoding')
+    parser.add_argument("--tts-cache", action="store_true", help="Leave the TTS clip cache on")
+    parser.add_argument("--no-streaming", action="store_true", help="Request the transcript without streaming")
+    parser.add_argument("--database", default="podini_benchmark", help="Scratch database name")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark podcasts and files")
+    args = parser.parse_args()
+    args.concurrency = args.concurrency or args.jobs
+
+    settings = MockSettings(
+        rounds=args.rounds,
+        words_per_turn=args.words_per_turn,
+        llm_latency=args.llm_latency,
+        llm_tokens_per_second=args.llm_tokens_per_second,
+        tts_latency=args.tts_latency,
+        tts_realtime_factor=args.tts_realtime_factor,
+        tts_slots=args.tts_slots,
+        tts_queue_limit=args.tts_queue_limit,
+        image_latency=args.image_latency,
+    )
+    processes, urls = _start_mocks(settings, args.tts_nodes)
+    _configure_environment(args, urls)
+
+    # The pipeline writes relative to the working directory
+    app_directory = os.getcwd()
+    sys.path.insert(0, app_directory)
+    work_directory = tempfile.mkdtemp(prefix="podini-benchmark-")
+    os.chdir(work_directory)
+    try:
+        asyncio.run(run_benchmark(args))
+    finally:
+        os.chdir(app_directory)
+        if args.keep:
+            print(f"Files kept in {work_directory}")
+        else:
+            shutil.rmtree(work_directory, ignore_errors=True)
+        for process in processes:
+            process.terminate()
+            process.join()
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 CREDIT_VALUE = float(os.getenv("CREDIT_VALUE", "1.0"))
+# Credits reserved when a podcast is queued, refunded if its generation fails
+PODCAST_CREDIT_COST = float(os.getenv("PODCAST_CREDIT_COST", "1.0"))
 
 # Email config
 SMTP_SERVER = os.getenv("SMTP_SERVER")
@@ -18,4 +20,96 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 FROM_EMAIL = os.getenv("FROM_EMAIL")
-FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
\ No newline at end of file
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
+
+# TTS config
+COQUI_API_URL = os.getenv("COQUI_API_URL", "http://[::1]:5002")
+COQUI_MAX_CONCURRENCY = int(os.getenv("COQUI_MAX_CONCURRENCY", 4))
+TTS_MAX_RETRIES = int(os.getenv("TTS_MAX_RETRIES", 3))
+TTS_RETRY_BACKOFF = float(os.getenv("TTS_RETRY_BACKOFF", "1.0"))
+
+def _parse_tts_backends(value: str) -> dict:
+    """Parse "url=concurrency,url=concurrency" into {url: concurrency}"""
+    backends = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        url, _, concurrency = entry.rpartition("=")
+        if not url:
+            url, concurrency = concurrency, COQUI_MAX_CONCURRENCY
+        backends[url.rstrip("/")] = max(1, int(concurrency))
+    return backends
+
+# Pool of TTS servers and the concurrency of each, e.g. "http://gpu1:5002=4,http://gpu2:5002=8"
+TTS_BACKENDS = _parse_tts_backends(os.getenv("TTS_BACKENDS", "")) or {COQUI_API_URL: COQUI_MAX_CONCURRENCY}
+# A node failing this many requests in a row, or a health check, is taken out of the pool for a while
+TTS_EJECT_AFTER_FAILURES = int(os.getenv("TTS_EJECT_AFTER_FAILURES", 3))
+TTS_EJECT_SECONDS = float(os.getenv("TTS_EJECT_SECONDS", "30"))
+TTS_HEALTH_CHECK_INTERVAL = float(os.getenv("TTS_HEALTH_CHECK_INTERVAL", "10"))
+TTS_HEALTH_CHECK_PATH = os.getenv("TTS_HEALTH_CHECK_PATH", "/")
+TTS_HEALTH_CHECK_TIMEOUT = float(os.getenv("TTS_HEALTH_CHECK_TIMEOUT", "5"))
+
+# TTS audio cache config
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Job queue / worker config
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 60))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 2))
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "2.0"))
+
+# Outbound HTTP config
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+# Longest Retry-After honoured, by retries and by the provider limiters' pauses
+HTTP_MAX_RETRY_AFTER = float(os.getenv("HTTP_MAX_RETRY_AFTER", "60"))
+
+# Provider limits: calls over a budget or the concurrency limit queue instead of failing.
+# Budgets are per minute, 0 leaves them unmetered; set them to your account's tier.
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", 500))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", 0))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 8))
+# Completion tokens assumed per request until the response reports its usage
+OPENAI_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_TOKENS_ESTIMATE", 2000))
+REPLICATE_REQUESTS_PER_MINUTE = float(os.getenv("REPLICATE_REQUESTS_PER_MINUTE", 600))
+REPLICATE_MAX_CONCURRENCY = int(os.getenv("REPLICATE_MAX_CONCURRENCY", 4))
+# Seconds a prediction may take, polling included, before it is canceled
+REPLICATE_PREDICTION_TIMEOUT = float(os.getenv("REPLICATE_PREDICTION_TIMEOUT", "300"))
+# Concurrency backs off when latency exceeds this multiple of the best seen
+LIMITER_LATENCY_TOLERANCE = float(os.getenv("LIMITER_LATENCY_TOLERANCE", "3.0"))
+
+# Stream the transcript and start TTS on each round as soon as it is complete
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+# Completions requested per stage before giving up, only spent when local repair can't fix the output
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 5))
+
+# Compressed renditions produced after assembly, "format:bitrate" in order of preference
+AUDIO_RENDITIONS = [entry.strip() for entry in os.getenv("AUDIO_RENDITIONS", "mp3:96k,opus:48k").split(",") if entry.strip()]
+TRANSCODE_MAX_WORKERS = int(os.getenv("TRANSCODE_MAX_WORKERS", 2))
+# Keep the uncompressed WAV once the renditions exist
+KEEP_WAV_MASTER = os.getenv("KEEP_WAV_MASTER", "false").lower() == "true"
+
+# Authenticated user lookup cache
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+
+# Cursor pagination of list endpoints
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", 50))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 200))
+
+# Password hashing
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
+# Stripe webhook inbox
+STRIPE_APPLY_BATCH_SIZE = int(os.getenv("STRIPE_APPLY_BATCH_SIZE", 100))
+STRIPE_APPLY_INTERVAL = float(os.getenv("STRIPE_APPLY_INTERVAL", "1.0"))
+STRIPE_EVENT_RETENTION_DAYS = int(os.getenv("STRIPE_EVENT_RETENTION_DAYS", 30))
+
+# LLM completion cache
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 30 * 24 * 3600))
@@ -1,17 +1,18 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
 from config import MONGODB_URL, SOFTWARE_NAME
 
 client = None
-db = None
 
 def init_db():
-    global client, db
-    db = MongoClient(MONGODB_URL)
+    global client
+    # Connects lazily, on the event loop that runs the first operation
+    client = AsyncMongoClient(MONGODB_URL)
 
 def get_db():
-    return db[SOFTWARE_NAME]
+    return client[SOFTWARE_NAME]
 
-def close_db():
+async def close_db():
     global client
     if client:
-        client.close()
+        await client.close()
+        client = None
@@ -1,16 +1,26 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 import uvicorn
 from config import SOFTWARE_NAME
-from database import close_db, init_db
+from database import close_db, get_db, init_db
 from fastapi import FastAPI
 from routers import auth, protected, payment, ai, podcast
+from utils.db_indexes import ensure_indexes
+from utils.http_client import close_clients
+from utils.stripe_inbox import run_applier
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    await ensure_indexes(get_db())
+    stopping = asyncio.Event()
+    applier = asyncio.create_task(run_applier(stopping))
     yield
-    close_db()
+    stopping.set()
+    await applier
+    await close_clients()
+    await close_db()
 
 app = FastAPI(
     lifespan=lifespan,
@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+
+from database import close_db, get_db, init_db
+from utils.db_indexes import INDEXES, ensure_indexes, explain_query, hot_queries
+from repositories import podcast_repo
+from utils.credit_operations import refund_podcast_credits
+from utils.job_queue import detach_episodes, detached_episodes, reattach_episodes, resume_podcast
+from utils.llm_cache import llm_cache
+
+async def resume(args):
+    for podcast_id in args.podcast_ids:
+        podcast = await podcast_repo.find_by_id(podcast_id)
+        if not podcast:
+            # Also a malformed id
+            print(f"{podcast_id}: not found")
+            continue
+        detached = await detached_episodes(podcast)
+        if detached:
+            # Refunded, the rerun is on the house like the resumed episode's. Reattached
+            # before the first episode is queued, its "series" stage only releases waiting episodes
+            for episode in detached:
+                await refund_podcast_credits(episode["_id"])
+            reattached = await reattach_episodes(podcast["series_id"])
+            print(f"{podcast_id}: {reattached} episodes of its series waiting on it again")
+
+        if not await resume_podcast(podcast_id):
+            if detached:
+                await detach_episodes(podcast["series_id"])
+            print(f"{podcast_id}: not in error status, or waiting on the first episode of its series")
+            continue
+        print(f"{podcast_id}: queued, completed stages will be skipped")
+
+async def indexes(args):
+    db = get_db()
+    await ensure_indexes(db)
+    for collection in INDEXES:
+        async for index in await db[collection].list_indexes():
+            options = ", ".join(
+                f"{key}={index[key]}" for key in ("unique", "expireAfterSeconds") if key in index
+            )
+            print(f"{collection}.{index['name']}: {dict(index['key'])}" + (f" ({options})" if options else ""))
+
+async def explain(args):
+    db = get_db()
+    for query in await hot_queries(db):
+        if args.query and args.query not in query["name"]:
+            continue
+        result = await explain_query(db, query)
+        plan = " <- ".join(result["plan"])
+        collection_scan = " [COLLECTION SCAN]" if "COLLSCAN" in plan else ""
+        print(f"{query['name']} ({query['collection']}){collection_scan}")
+        print(f"  plan: {plan}")
+        print(
+            f"  returned {result['returned']}, keys examined {result['keys_examined']}, "
+            f"docs examined {result['docs_examined']}, {result['time_ms']} ms"
+        )
+
+async def llm_cache_stats(args):
+    if not llm_cache:
+        print("LLM cache is disabled (LLM_CACHE_ENABLED=false)")
+        return
+    stats = await llm_cache.stats()
+    print(f"entries: {stats['entries']}")
+    print(f"hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {stats['hit_rate']:.1%}")
+
+async def run(args):
+    init_db()
+    try:
+        await args.func(args)
+    finally:
+        await close_db()
+
+def main():
+    parser = argparse.ArgumentParser(description="Podini maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    resume_parser = subparsers.add_parser("resume", help="Requeue failed podcasts from their last completed stage")
+    resume_parser.add_argument("podcast_ids", nargs="+")
+    resume_parser.set_defaults(func=resume)
+
+    indexes_parser = subparsers.add_parser("indexes", help="Create missing indexes and list them")
+    indexes_parser.set_defaults(func=indexes)
+
+    explain_parser = subparsers.add_parser("explain", help="Print the query plan of every hot query")
+    explain_parser.add_argument("query", nargs="?", help="Only explain queries whose name contains this")
+    explain_parser.set_defaults(func=explain)
+
+    cache_parser = subparsers.add_parser("llm-cache", help="Print LLM completion cache hit-rate stats")
+    cache_parser.set_defaults(func=llm_cache_stats)
+
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
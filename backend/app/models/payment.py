@@ -10,10 +10,11 @@ class PaymentResponse(BaseModel):
 
 class PaginatedPaymentResponse(BaseModel):
     items: List[PaymentResponse]
-    total: int
-    page: int
     size: int
-    pages: int
+    next_cursor: Optional[str] = None
+    # Only filled in when the client asks for include_total
+    total: Optional[int] = None
+    pages: Optional[int] = None
 
 class CreatePaymentIntent(BaseModel):
     amount: int  # Amount in cents
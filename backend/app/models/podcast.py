@@ -0,0 +1,64 @@
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import Dict, List
+
+class StructureTopic(BaseModel):
+    topic: str = ""
+    description: str = ""
+
+    @model_validator(mode="before")
+    @classmethod
+    def coerce(cls, data):
+        # A bare string is taken as the topic, a null as an empty slot
+        if data is None:
+            return {}
+        if isinstance(data, str):
+            return {"topic": data}
+        return data
+
+    @field_validator("topic", "description", mode="before")
+    @classmethod
+    def none_to_empty(cls, value):
+        return "" if value is None else value
+
+class PodcastStructure(BaseModel):
+    """Episode topics keyed "1" to "5". The prompt allows trailing slots to be left empty."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    episode_1: StructureTopic = Field(alias="1")
+    episode_2: StructureTopic = Field(default_factory=StructureTopic, alias="2")
+    episode_3: StructureTopic = Field(default_factory=StructureTopic, alias="3")
+    episode_4: StructureTopic = Field(default_factory=StructureTopic, alias="4")
+    episode_5: StructureTopic = Field(default_factory=StructureTopic, alias="5")
+
+    @field_validator("episode_1")
+    @classmethod
+    def first_topic_required(cls, value: StructureTopic) -> StructureTopic:
+        if not value.topic.strip():
+            raise ValueError("the first topic is empty")
+        return value
+
+class Transcript(BaseModel):
+    rounds: List[Dict[str, str]] = Field(min_length=1)
+
+    @model_validator(mode="before")
+    @classmethod
+    def wrap_bare_list(cls, data):
+        return {"rounds": data} if isinstance(data, list) else data
+
+    @field_validator("rounds", mode="before")
+    @classmethod
+    def drop_empty_turns(cls, rounds):
+        if not isinstance(rounds, list):
+            return rounds
+        cleaned = []
+        for round in rounds:
+            if not isinstance(round, dict):
+                continue
+            round = {
+                speaker: str(text).strip()
+                for speaker, text in round.items()
+                if isinstance(text, (str, int, float)) and str(text).strip()
+            }
+            if round:
+                cleaned.append(round)
+        return cleaned
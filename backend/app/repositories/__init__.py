@@ -0,0 +1,9 @@
+from repositories.payments import PaymentRepository
+from repositories.podcasts import PodcastRepository
+from repositories.series import SeriesRepository
+from repositories.users import UserRepository
+
+user_repo = UserRepository()
+podcast_repo = PodcastRepository()
+payment_repo = PaymentRepository()
+series_repo = SeriesRepository()
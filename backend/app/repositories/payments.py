@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from database import get_db
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from utils.pagination import fetch_page
+
+DUPLICATE_KEY = 11000
+
+class PaymentRepository:
+    """Async access to the payments collection and the Stripe event inbox"""
+
+    @property
+    def collection(self):
+        return get_db().payments
+
+    @property
+    def events(self):
+        return get_db().stripe_events
+
+    async def insert(self, payment: dict) -> ObjectId:
+        result = await self.collection.insert_one(payment)
+        return result.inserted_id
+
+    async def upsert_many(self, payments: List[dict]) -> None:
+        """Insert payments whose payment_id isn't stored yet, existing ones are left untouched"""
+        try:
+            await self.collection.bulk_write(
+                [UpdateOne({"payment_id": payment["payment_id"]}, {"$setOnInsert": payment}, upsert=True)
+                 for payment in payments],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            # Two concurrent upserts of one payment_id: the unique index let one in, which is the goal
+            if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                raise
+
+    async def uncredited(self, payment_ids: List[str]) -> List[str]:
+        """The payments among payment_ids whose credits haven't been added yet"""
+        return await self.collection.distinct(
+            "payment_id", {"payment_id": {"$in": payment_ids}, "credits_added": False}
+        )
+
+    async def mark_credits_added(self, payment_ids: List[str]) -> None:
+        await self.collection.update_many({"payment_id": {"$in": payment_ids}}, {"$set": {"credits_added": True}})
+
+    async def record_event(self, event: dict) -> bool:
+        """Store a webhook event in the inbox, False if its id was already received"""
+        try:
+            await self.events.insert_one(event)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def pending_events(self, limit: int) -> List[dict]:
+        return await self.events.find({"status": "pending"}).sort("received_at", 1).limit(limit).to_list()
+
+    async def mark_events(self, event_ids: List[str], status: str, error: Optional[str] = None) -> None:
+        updates = {"status": status, "processed_at": datetime.utcnow()}
+        if error:
+            updates["error"] = error
+        await self.events.update_many({"_id": {"$in": event_ids}}, {"$set": updates})
+
+    async def page_for_user(
+        self,
+        user_id: ObjectId,
+        projection: dict,
+        cursor: Optional[str],
+        limit: int
+    ) -> Tuple[List[dict], Optional[str]]:
+        return await fetch_page(self.collection, {"user_id": user_id}, projection, cursor, limit)
+
+    async def count_for_user(self, user_id: ObjectId) -> int:
+        return await self.collection.count_documents({"user_id": user_id})
+
+    async def find_recent(self, user_id: ObjectId, status: str, since: datetime) -> Optional[dict]:
+        return await self.collection.find_one({
+            "user_id": user_id,
+            "status": status,
+            "payment_date": {"$gte": since}
+        })
@@ -0,0 +1,217 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from database import get_db
+from pymongo import ReturnDocument
+from utils.pagination import fetch_page
+
+def _object_id(podcast_id) -> Optional[ObjectId]:
+    try:
+        return ObjectId(podcast_id)
+    except (InvalidId, TypeError):
+        return None
+
+def _lease_free(now: datetime) -> dict:
+    return {"$or": [{"lease_expires_at": {"$exists": False}}, {"lease_expires_at": {"$lt": now}}]}
+
+def _claimable(statuses: List[str], now: datetime) -> dict:
+    """Unleased podcasts in one of statuses, or ready but still to be transcoded"""
+    return {
+        "$and": [
+            {"$or": [{"status": {"$in": statuses}}, {"status": "ready", "transcode_pending": True}]},
+            _lease_free(now)
+        ]
+    }
+
+class PodcastRepository:
+    """Async access to the podcasts collection"""
+
+    @property
+    def collection(self):
+        return get_db().podcasts
+
+    async def insert(self, podcast: dict) -> str:
+        result = await self.collection.insert_one(podcast)
+        return str(result.inserted_id)
+
+    async def insert_many(self, podcasts: List[dict]) -> List[str]:
+        result = await self.collection.insert_many(podcasts)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+
+    async def find_by_id(self, podcast_id, projection: Optional[dict] = None) -> Optional[dict]:
+        object_id = _object_id(podcast_id)
+        if object_id is None:
+            return None
+        return await self.collection.find_one({"_id": object_id}, projection)
+
+    async def find_for_user(self, podcast_id, user_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+        """A podcast, only if it belongs to user_id"""
+        object_id = _object_id(podcast_id)
+        if object_id is None:
+            return None
+        return await self.collection.find_one({"_id": object_id, "userID": user_id}, projection)
+
+    async def page_for_user(
+        self,
+        user_id: str,
+        projection: dict,
+        cursor: Optional[str],
+        limit: int,
+        query: Optional[dict] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        return await fetch_page(self.collection, {"userID": user_id, **(query or {})}, projection, cursor, limit)
+
+    async def find_series_episodes(self, series_id: str, projection: Optional[dict] = None) -> List[dict]:
+        """The podcasts of a series, in episode order"""
+        cursor = self.collection.find({"series_id": series_id}, projection).sort("episode", 1)
+        return await cursor.to_list()
+
+    async def find_failed_series(self, series_id: Optional[str] = None) -> List[str]:
+        """
+        Series (the given one, or any with waiting episodes) whose first
+        episode failed before its "series" stage shared the structure.
+        """
+        query = {"episode": 1, "status": "error", "completed_stages": {"$ne": "series"}}
+        if series_id:
+            query["series_id"] = series_id
+        else:
+            query["series_id"] = {"$in": await self.collection.distinct("series_id", {"status": "waiting"})}
+        return await self.collection.distinct("series_id", query)
+
+    async def detach_waiting_episodes(self, series_ids: List[str], error_message: str) -> None:
+        """Fail the episodes waiting on these series, marking them detached (see reattach_episodes)"""
+        await self.collection.update_many(
+            {"series_id": {"$in": series_ids}, "status": "waiting"},
+            {"$set": {"status": "error", "error_message": error_message, "detached_from_series": True}}
+        )
+
+    async def find_detached_episodes(self, series_id: str) -> List[dict]:
+        """Episodes failed because the first episode of their series failed, before they ever ran"""
+        return await self.collection.find(
+            {"series_id": series_id, "status": "error", "detached_from_series": True}, {"_id": 1}
+        ).to_list()
+
+    async def reattach_episodes(self, series_id: str, credits_reserved: float) -> int:
+        """Put detached, already refunded episodes back to waiting on their series, returns how many"""
+        result = await self.collection.update_many(
+            {"series_id": series_id, "status": "error", "detached_from_series": True, "credits_reserved": 0},
+            {
+                "$set": {"status": "waiting", "credits_reserved": credits_reserved, "credits_refunded": False},
+                "$unset": {"detached_from_series": "", "error_message": ""}
+            }
+        )
+        return result.modified_count
+
+    async def claim_job(
+        self, statuses: List[str], max_attempts: int, worker_id: str, now: datetime, lease_expires_at: datetime
+    ) -> Optional[dict]:
+        """
+        Lease the oldest claimable podcast (see _claimable) that has attempts
+        left to worker_id. Unleased means never leased or the lease expired.
+        """
+        return await self.collection.find_one_and_update(
+            {**_claimable(statuses, now), "attempts": {"$lt": max_attempts}},
+            {
+                "$set": {"lease_owner": worker_id, "lease_expires_at": lease_expires_at, "started_at": now},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("_id", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def renew_lease(self, podcast_id, worker_id: str, lease_expires_at: datetime) -> bool:
+        """Extend a lease, returns False if worker_id no longer holds it"""
+        result = await self.collection.update_one(
+            {"_id": ObjectId(podcast_id), "lease_owner": worker_id},
+            {"$set": {"lease_expires_at": lease_expires_at}}
+        )
+        return result.matched_count == 1
+
+    async def release_lease(self, podcast_id, worker_id: str) -> None:
+        await self.collection.update_one(
+            {"_id": ObjectId(podcast_id), "lease_owner": worker_id},
+            {"$unset": {"lease_owner": "", "lease_expires_at": ""}}
+        )
+
+    async def fail_abandoned_jobs(self, statuses: List[str], max_attempts: int, now: datetime, error_message: str) -> int:
+        """Fail unleased podcasts in one of statuses that used up max_attempts, returns how many"""
+        result = await self.collection.update_many(
+            {"status": {"$in": statuses}, "attempts": {"$gte": max_attempts}, **_lease_free(now)},
+            {
+                "$set": {"status": "error", "error_message": error_message},
+                "$unset": {"lease_owner": "", "lease_expires_at": ""}
+            }
+        )
+        return result.modified_count
+
+    async def abandon_transcoding(self, max_attempts: int, now: datetime) -> int:
+        """Stop reclaiming ready podcasts whose transcoding used up max_attempts, they keep the WAV"""
+        result = await self.collection.update_many(
+            {"status": "ready", "transcode_pending": True, "attempts": {"$gte": max_attempts}, **_lease_free(now)},
+            {"$unset": {"transcode_pending": "", "lease_owner": "", "lease_expires_at": ""}}
+        )
+        return result.modified_count
+
+    async def requeue_failed(
+        self, podcast_id, user_id: Optional[str] = None, credits_reserved: Optional[float] = None
+    ) -> bool:
+        """
+        Set a failed podcast back to pending with fresh attempts, unless it is
+        detached from its series or its refund is still in progress (a
+        refund would be lost with the reservation it's for).
+        """
+        object_id = _object_id(podcast_id)
+        if object_id is None:
+            return False
+        query = {
+            "_id": object_id, "status": "error",
+            "detached_from_series": {"$ne": True}, "refund_id": {"$exists": False}
+        }
+        if user_id:
+            query["userID"] = user_id
+
+        updates = {"status": "pending", "attempts": 0}
+        if credits_reserved is not None:
+            updates["credits_reserved"] = credits_reserved
+            updates["credits_refunded"] = False
+
+        result = await self.collection.update_one(
+            query,
+            {
+                "$set": updates,
+                "$unset": {"error_message": "", "lease_owner": "", "lease_expires_at": ""}
+            }
+        )
+        return result.modified_count == 1
+
+    async def update(self, podcast_id, update: dict) -> bool:
+        """Apply an update document, returns whether the podcast exists"""
+        result = await self.collection.update_one({"_id": ObjectId(podcast_id)}, update)
+        return result.matched_count == 1
+
+    async def claim_refund(self, podcast_id=None) -> Optional[dict]:
+        """
+        Tag the credits reserved by a failed podcast (the given one, or any)
+        with a refund id. A refund that didn't finish keeps its id, so whoever
+        claims it next credits the user under the same one.
+
+        :return: the podcast with its refund_id and the amount to refund, or None
+        """
+        query = {"status": "error", "credits_reserved": {"$gt": 0}}
+        if podcast_id is not None:
+            query["_id"] = ObjectId(podcast_id)
+        return await self.collection.find_one_and_update(
+            query,
+            [{"$set": {"refund_id": {"$ifNull": ["$refund_id", ObjectId()]}}}],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def finish_refund(self, podcast_id, refund_id: ObjectId) -> bool:
+        """Zero a claimed refund once the user has been credited, True for the one caller that does"""
+        result = await self.collection.update_one(
+            {"_id": ObjectId(podcast_id), "refund_id": refund_id},
+            {"$set": {"credits_reserved": 0, "credits_refunded": True}, "$unset": {"refund_id": ""}}
+        )
+        return result.modified_count == 1
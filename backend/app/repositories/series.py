@@ -0,0 +1,31 @@
+from typing import List, Optional
+
+from bson import ObjectId
+from database import get_db
+from repositories.podcasts import _object_id
+
+class SeriesRepository:
+    """Async access to the series collection, the shared record of a multi-episode generation"""
+
+    @property
+    def collection(self):
+        return get_db().series
+
+    async def insert(self, series: dict) -> str:
+        result = await self.collection.insert_one(series)
+        return str(result.inserted_id)
+
+    async def find_for_user(self, series_id, user_id: str) -> Optional[dict]:
+        object_id = _object_id(series_id)
+        if object_id is None:
+            return None
+        return await self.collection.find_one({"_id": object_id, "userID": user_id})
+
+    async def update(self, series_id, update: dict) -> bool:
+        result = await self.collection.update_one({"_id": ObjectId(series_id)}, update)
+        return result.matched_count == 1
+
+    async def set_status(self, series_ids: List[str], status: str) -> None:
+        await self.collection.update_many(
+            {"_id": {"$in": [ObjectId(series_id) for series_id in series_ids]}}, {"$set": {"status": status}}
+        )
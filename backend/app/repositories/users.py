@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from database import get_db
+from pymongo import ReturnDocument, UpdateOne
+
+# Payment and refund ids remembered per user, far more than can ever be in flight at once
+RECENT_CREDITS = 100
+
+def _credit_once(user_id: ObjectId, credit_id, credits: float) -> Tuple[dict, dict]:
+    """
+    Add credits unless credit_id is among the user's recent credits. The id is
+    recorded in the same update, and only the most recent ones are kept: the
+    durable record of what was credited is the payment or podcast it's for.
+    """
+    return (
+        {"_id": user_id, "recent_credits": {"$ne": credit_id}},
+        {"$inc": {"credits": credits}, "$push": {"recent_credits": {"$each": [credit_id], "$slice": -RECENT_CREDITS}}}
+    )
+
+class UserRepository:
+    """Async access to the users collection and the password reset tokens"""
+
+    @property
+    def collection(self):
+        return get_db().users
+
+    @property
+    def password_resets(self):
+        return get_db().password_resets
+
+    async def find_by_email(self, email: str) -> Optional[dict]:
+        return await self.collection.find_one({"email": email})
+
+    async def find_by_id(self, user_id: ObjectId) -> Optional[dict]:
+        return await self.collection.find_one({"_id": user_id})
+
+    async def create(self, user: dict) -> ObjectId:
+        result = await self.collection.insert_one(user)
+        return result.inserted_id
+
+    async def set_password(self, user_id: ObjectId, hashed_password: str) -> None:
+        await self.collection.update_one({"_id": user_id}, {"$set": {"password": hashed_password}})
+
+    async def add_credits(self, user_id: ObjectId, credits: float) -> None:
+        await self.collection.update_one({"_id": user_id}, {"$inc": {"credits": credits}})
+
+    async def add_payment_credits(self, payments: List[Tuple[ObjectId, str, float]]) -> None:
+        """
+        Credit (user_id, payment_id, credits) entries in one batch, each once
+        however often the batch is retried before its payments are marked.
+        """
+        await self.collection.bulk_write(
+            [UpdateOne(*_credit_once(user_id, payment_id, credits)) for user_id, payment_id, credits in payments],
+            ordered=False
+        )
+
+    async def apply_refund(self, user_id: ObjectId, refund_id: ObjectId, credits: float) -> bool:
+        """Credit a refund, unless it was already. Returns whether this call added the credits."""
+        result = await self.collection.update_one(*_credit_once(user_id, refund_id, credits))
+        return result.modified_count == 1
+
+    async def deduct_credits(self, query: dict, credits: float) -> Optional[dict]:
+        """
+        Take credits from the user matching query, only if they have enough.
+        The balance check and the decrement are a single atomic operation.
+
+        :return: the updated user, or None if no user matched or the balance is too low
+        """
+        return await self.collection.find_one_and_update(
+            {**query, "credits": {"$gte": credits}},
+            {"$inc": {"credits": -credits}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def create_reset_token(self, user_id: ObjectId, token: str, expires_at: datetime) -> None:
+        # Expired tokens are deleted by the TTL index on expires_at
+        await self.password_resets.insert_one({"token": token, "user_id": user_id, "expires_at": expires_at})
+
+    async def find_reset_token(self, token: str) -> Optional[dict]:
+        return await self.password_resets.find_one({"token": token})
+
+    async def delete_reset_tokens(self, user_id: ObjectId) -> None:
+        await self.password_resets.delete_many({"user_id": user_id})
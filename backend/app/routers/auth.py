@@ -1,10 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.user import UserCreate, UserLogin, UserChangePassword, ForgotPasswordRequest, ResetPasswordRequest
-from utils.security import get_password_hash, verify_password, get_current_user, create_user_response, create_access_token
-from database import get_db
-from bson import ObjectId
+from utils.security import get_password_hash, verify_password, verify_and_update_password, get_current_user_doc, create_user_response, create_access_token
+from repositories import user_repo
 from datetime import datetime, timedelta
 from utils.email_operations import send_email
+from utils.user_cache import user_cache
 import secrets
 import os
 
@@ -12,43 +12,46 @@ router = APIRouter()
 
 @router.post("/register")
 async def register(user: UserCreate):
-    db = get_db()
-    existing_user = db.users.find_one({"email": user.email})
+    existing_user = await user_repo.find_by_email(user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     new_user = {
         "email": user.email,
         "username": user.username,
         "password": hashed_password,
         "credits": user.initial_credits
     }
-    result = db.users.insert_one(new_user)
-    new_user["_id"] = result.inserted_id
+    new_user["_id"] = await user_repo.create(new_user)
     return create_user_response(new_user)
 
 @router.post("/login")
 async def login(user: UserLogin):
-    db = get_db()
-    db_user = db.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    db_user = await user_repo.find_by_email(user.email)
+    if not db_user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+
+    valid, new_hash = await verify_and_update_password(user.password, db_user["password"])
+    if not valid:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made, store one with the current cost
+        await user_repo.set_password(db_user["_id"], new_hash)
+        user_cache.invalidate(email=db_user["email"])
     return create_user_response(db_user)
 
 @router.post("/change-password")
-async def change_password(user_data: UserChangePassword, current_user: str = Depends(get_current_user)):
-    db = get_db()
-    db_user = db.users.find_one({"email": current_user})
-    if not db_user or not verify_password(user_data.old_password, db_user["password"]):
+async def change_password(user_data: UserChangePassword, user: dict = Depends(get_current_user_doc)):
+    if not await verify_password(user_data.old_password, user["password"]):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
-    new_hashed_password = get_password_hash(user_data.new_password)
-    db.users.update_one({"email": current_user}, {"$set": {"password": new_hashed_password}})
+    new_hashed_password = await get_password_hash(user_data.new_password)
+    await user_repo.set_password(user["_id"], new_hashed_password)
+    user_cache.invalidate(email=user["email"])
     return {"message": "Password changed successfully"}
 
 @router.post("/forgot-password")
 async def forgot_password(request: ForgotPasswordRequest):
-    db = get_db()
-    user = db.users.find_one({"email": request.email})
+    user = await user_repo.find_by_email(request.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -56,10 +59,7 @@ async def forgot_password(request: ForgotPasswordRequest):
     reset_token = secrets.token_urlsafe(32)
     expiration = datetime.utcnow() + timedelta(hours=1)
 
-    db.users.update_one(
-        {"email": request.email},
-        {"$set": {"reset_token": reset_token, "reset_token_exp": expiration}}
-    )
+    await user_repo.create_reset_token(user["_id"], reset_token, expiration)
 
     # Send email
     frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
@@ -79,30 +79,27 @@ async def forgot_password(request: ForgotPasswordRequest):
 
 @router.post("/reset-password")
 async def reset_password(request: ResetPasswordRequest):
-    db = get_db()
-    user = db.users.find_one({"reset_token": request.token})
-    if not user:
+    reset = await user_repo.find_reset_token(request.token)
+    if not reset:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
 
-    if user["reset_token_exp"] < datetime.utcnow():
+    # The TTL monitor only runs once a minute, so the expiry is still checked here
+    if reset["expires_at"] < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Reset token has expired")
 
+    user = await user_repo.find_by_id(reset["user_id"])
+    if not user:
+        raise HTTPException(status_code=400, detail="Invalid or expired reset token")
+
     # Update password
-    new_hashed_password = get_password_hash(request.new_password)
-    db.users.update_one(
-        {"_id": user["_id"]},
-        {
-            "$set": {"password": new_hashed_password},
-            "$unset": {"reset_token": "", "reset_token_exp": ""}
-        }
-    )
+    new_hashed_password = await get_password_hash(request.new_password)
+    await user_repo.set_password(user["_id"], new_hashed_password)
+    # Any other outstanding token for this user is void once the password changed
+    await user_repo.delete_reset_tokens(user["_id"])
+    user_cache.invalidate(email=user["email"])
 
     return {"message": "Password reset successfully"}
 
 @router.get("/user-info")
-async def get_user_info(current_user: str = Depends(get_current_user)):
-    db = get_db()
-    user = db.users.find_one({"email": current_user})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_user_info(user: dict = Depends(get_current_user_doc)):
     return create_user_response(user)
\ No newline at end of file
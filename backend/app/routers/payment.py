@@ -1,14 +1,15 @@
 import stripe
 from fastapi import APIRouter, Depends, HTTPException, Request
-from datetime import datetime
 from math import ceil
 from typing import Optional
 from bson import ObjectId
 
 from config import STRIPE_SECRET_KEY, STRIPE_WEBHOOK_SECRET, CREDIT_VALUE, FRONTEND_URL
-from database import get_db
+from repositories import payment_repo
 from models.payment import PaymentResponse, PaginatedPaymentResponse, CreatePaymentIntent
-from utils.security import get_current_user
+from utils.pagination import InvalidCursor, page_size
+from utils.security import get_current_user_doc
+from utils.stripe_inbox import record_event
 
 router = APIRouter()
 stripe.api_key = STRIPE_SECRET_KEY
@@ -16,20 +17,14 @@ stripe.api_key = STRIPE_SECRET_KEY
 @router.post("/create-checkout-session/{credits}")
 async def create_checkout_session(
     credits: float,
-    current_user: str = Depends(get_current_user)
+    user: dict = Depends(get_current_user_doc)
 ):
     try:
-        db = get_db()
-        user = db.users.find_one({"email": current_user})
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
         # Calculate amount in cents (Stripe requires integer amounts)
         amount = int(credits * CREDIT_VALUE * 100)  # Convert to cents
 
         checkout_session = stripe.checkout.Session.create(
-            customer_email=current_user,
+            customer_email=user["email"],
             payment_method_types=['card'],
             line_items=[{
                 'price_data': {
@@ -69,61 +64,34 @@ async def stripe_webhook(request: Request):
     except stripe.error.SignatureVerificationError as e:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-
-        # Handle the successful payment
-        db = get_db()
-        user_id = ObjectId(session.metadata.get('user_id'))
-
-        payment_data = {
-            "user_id": user_id,
-            "payment_id": session.id,
-            "status": "completed",
-            "amount": session.amount_total / 100,  # Convert cents to dollars
-            "description": "Credit purchase",
-            "payment_date": datetime.utcnow(),
-            "credits_added": False
-        }
-
-        db.payments.insert_one(payment_data)
-
-        # Calculate credits to add
-        credits_to_add = (session.amount_total / 100) / CREDIT_VALUE
-
-        # Add credits to user's account
-        db.users.update_one(
-            {"_id": user_id},
-            {"$inc": {"credits": credits_to_add}}
-        )
-
-        # Mark credits as added
-        db.payments.update_one(
-            {"payment_id": session.id},
-            {"$set": {"credits_added": True}}
-        )
+    # Only persisted here, credits are applied in batches by the inbox applier.
+    # Stripe redelivers events it thinks failed, duplicates are acknowledged all the same
+    await record_event(event.to_dict())
 
     return {"status": "success"}
 
 @router.get("/payments", response_model=PaginatedPaymentResponse)
 async def get_payments(
-    current_user: str = Depends(get_current_user),
-    page: int = 1,
-    size: int = 10
+    user: dict = Depends(get_current_user_doc),
+    cursor: Optional[str] = None,
+    size: int = 10,
+    include_total: bool = False
 ):
-    db = get_db()
-    user = db.users.find_one({"email": current_user})
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    filter_query = {"user_id": ObjectId(user["_id"])}
-    total = db.payments.count_documents(filter_query)
+    user_id = ObjectId(user["_id"])
+    size = page_size(size)
 
-    total_pages = ceil(total / size)
-    skip = (page - 1) * size
+    try:
+        payments, next_cursor = await payment_repo.page_for_user(
+            user_id,
+            {"payment_id": 1, "status": 1, "amount": 1, "description": 1},
+            cursor,
+            size
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    payments = db.payments.find(filter_query).skip(skip).limit(size)
+    # Counting walks every matching index key, so it is only done on request
+    total = await payment_repo.count_for_user(user_id) if include_total else None
 
     items = [
         PaymentResponse(
@@ -136,8 +104,8 @@ async def get_payments(
 
     return PaginatedPaymentResponse(
         items=items,
-        total=total,
-        page=page,
         size=size,
-        pages=total_pages
+        next_cursor=next_cursor,
+        total=total,
+        pages=ceil(total / size) if total is not None else None
     )
\ No newline at end of file
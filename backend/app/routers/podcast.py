@@ -1,25 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import StreamingResponse, FileResponse
-from utils.security import get_current_user
-from database import get_db
-from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from utils.security import get_current_user_doc
+from repositories import podcast_repo
+from utils.audio_assembly import compiled_audio_path, wav_header
+from utils.file_response import RangeFileResponse
+from utils.pagination import InvalidCursor, page_size, set_next_page_headers
+from utils.transcoding import choose_rendition
+from typing import Optional
+from utils.subtitles import cues_to_webvtt, srt_to_webvtt, write_webvtt
 import os
-import re
 
 router = APIRouter()
 
 @router.get("/get-structure")
-async def get_podcast_structure(current_user: str = Depends(get_current_user)):
-    db = get_db()
-    user = db.users.find_one({"email": current_user})
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def get_podcast_structure(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    user: dict = Depends(get_current_user_doc)
+):
     user_id = str(user["_id"])
 
-    # Fetch all podcasts for the user
-    podcasts = db.podcasts.find({"userID": user_id})
+    # Fetch a page of the user's podcasts, newest first
+    try:
+        podcasts, next_cursor = await podcast_repo.page_for_user(
+            user_id,
+            {"prompt": 1, "podcast_structure": 1},
+            cursor,
+            page_size(limit),
+            query={"podcast_structure": {"$exists": True}}
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    set_next_page_headers(response, request, next_cursor)
 
     # Create a dictionary to store podcast structures
     podcast_structures = {}
@@ -31,96 +45,131 @@ async def get_podcast_structure(current_user: str = Depends(get_current_user)):
     return podcast_structures
 
 @router.get("/stream-audio/{podcast_id}")
-async def stream_audio(podcast_id: str, current_user: str = Depends(get_current_user)):
-    db = get_db()
-    user = db.users.find_one({"email": current_user})
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    podcast = db.podcasts.find_one({"_id": ObjectId(podcast_id), "userID": str(user["_id"])})
+async def stream_audio(
+    podcast_id: str,
+    request: Request,
+    format: Optional[str] = None,
+    user: dict = Depends(get_current_user_doc)
+):
+    podcast = await podcast_repo.find_for_user(podcast_id, str(user["_id"]))
 
     if not podcast:
         raise HTTPException(status_code=404, detail="Podcast not found")
 
     if podcast["status"] != "ready":
-        raise HTTPException(status_code=400, detail="Podcast is not ready for streaming")
-
-    audio_path = podcast.get("compiled_audio_path")
-    if not audio_path or not os.path.exists(audio_path):
+        progress = podcast.get("progress") or {}
+        if not progress.get("published_bytes"):
+            raise HTTPException(status_code=400, detail="Podcast is not ready for streaming")
+        # Assembly renames the partial file to the final WAV, which starts with the same published bytes
+        for audio_path in (progress["audio_path"], compiled_audio_path(str(podcast["_id"]))):
+            try:
+                return stream_partial_audio(audio_path, progress, podcast["status"], request)
+            except FileNotFoundError:
+                continue
+        # Renamed and then replaced by its renditions, so the podcast is ready by now
+        podcast = await podcast_repo.find_for_user(podcast_id, str(user["_id"]))
+        if not podcast or podcast["status"] != "ready":
+            raise HTTPException(status_code=400, detail="Podcast is not ready for streaming")
+
+    # Pick a compressed rendition the client accepts, the WAV is only a fallback
+    selected = choose_rendition(
+        request.headers.get("accept"),
+        podcast.get("renditions") or {},
+        podcast.get("compiled_audio_path"),
+        requested_format=format
+    )
+    if not selected:
         raise HTTPException(status_code=404, detail="Audio file not found")
-
-    def iterfile():
-        chunk_size = 1024 * 1024  # 1MB chunks
-        with open(audio_path, mode="rb") as file:
-            while chunk := file.read(chunk_size):
-                yield chunk
-
-    return StreamingResponse(
-        iterfile(),
+    audio_path, media_type = selected
+
+    # Supports Range/conditional requests so seeking doesn't re-send the whole file
+    return RangeFileResponse(audio_path, request.headers, media_type=media_type, headers={"Vary": "Accept"})
+
+def stream_partial_audio(audio_path: str, progress: dict, status: str, request: Request) -> RangeFileResponse:
+    """
+    Serve the part of a podcast that has been assembled so far.
+
+    The growing file is cut at the last published clip boundary and sent with a
+    header rewritten for exactly that many bytes, so players get a complete WAV.
+    Requesting again later returns a longer prefix.
+    """
+    return RangeFileResponse(
+        audio_path,
+        request.headers,
         media_type="audio/wav",
+        prefix=wav_header(tuple(progress["format"]), progress["published_bytes"]),
+        offset=progress["data_offset"],
+        length=progress["published_bytes"],
         headers={
-            'Accept-Ranges': 'bytes',
-            'Content-Type': 'audio/wav'
+            'Cache-Control': 'no-store',
+            'X-Podcast-Status': status,
+            'X-Podcast-Duration': str(progress.get("duration", 0))
         }
     )
 
 @router.get("/get-subtitle/{podcast_id}")
-async def get_subtitle(podcast_id: str, current_user: str = Depends(get_current_user)):
-    db = get_db()
-    user = db.users.find_one({"email": current_user})
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    podcast = db.podcasts.find_one({"_id": ObjectId(podcast_id), "userID": str(user["_id"])})
+async def get_subtitle(podcast_id: str, request: Request, user: dict = Depends(get_current_user_doc)):
+    podcast = await podcast_repo.find_for_user(podcast_id, str(user["_id"]))
 
     if not podcast:
         raise HTTPException(status_code=404, detail="Podcast not found")
 
+    headers = {"Content-Disposition": f'attachment; filename="{podcast_id}_subtitles.vtt"'}
+
     if podcast["status"] != "ready":
-        raise HTTPException(status_code=400, detail="Podcast subtitles are not ready")
+        progress = podcast.get("progress") or {}
+        if not progress.get("cues"):
+            raise HTTPException(status_code=400, detail="Podcast subtitles are not ready")
+
+        # Cues for the audio published so far
+        return Response(
+            content=cues_to_webvtt(progress["cues"]),
+            media_type="text/vtt",
+            headers={**headers, "Cache-Control": "no-store"}
+        )
 
     subtitle_path = podcast.get("subtitle_path")
     if not subtitle_path or not os.path.exists(subtitle_path):
         raise HTTPException(status_code=404, detail="Subtitle file not found")
 
-    try:
-        with open(subtitle_path, 'r', encoding='ANSI') as file:
-            srt_content = file.read()
+    if not subtitle_path.endswith(".vtt"):
+        # Podcasts generated before subtitles were written as WebVTT: convert once and keep the result
+        try:
+            with open(subtitle_path, 'r', encoding='utf-8', errors='replace') as file:
+                webvtt_content = srt_to_webvtt(file.read())
+            subtitle_path = write_webvtt(webvtt_content, f"{os.path.splitext(subtitle_path)[0]}.vtt")
+            await podcast_repo.update(podcast["_id"], {"$set": {"subtitle_path": subtitle_path}})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing subtitles: {str(e)}")
 
-        # Remove speaker prefix from each line
-        srt_content = re.sub(r'\n[^>]*?: ', '\n', srt_content)
+    headers["Vary"] = "Accept-Encoding"
+    if "gzip" in request.headers.get("accept-encoding", "") and os.path.exists(f"{subtitle_path}.gz"):
+        headers["Content-Encoding"] = "gzip"
+        subtitle_path = f"{subtitle_path}.gz"
 
-        # Convert SRT to WebVTT
-        webvtt_content = "WEBVTT\n\n" + re.sub(
-            r'(\d{2}):(\d{2}):(\d{2}),(\d{3})',
-            r'\1:\2:\3.\4',
-            srt_content
-        )
-
-        return Response(
-            content=webvtt_content,
-            media_type="text/vtt",
-            headers={
-                "Content-Disposition": f'attachment; filename="{podcast_id}_subtitles.vtt"'
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing subtitles: {str(e)}")
+    return RangeFileResponse(subtitle_path, request.headers, media_type="text/vtt", headers=headers)
 
 @router.get("/user-podcasts")
-async def get_user_podcasts(current_user: str = Depends(get_current_user)):
-    db = get_db()
-    user = db.users.find_one({"email": current_user})
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def get_user_podcasts(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    user: dict = Depends(get_current_user_doc)
+):
     user_id = str(user["_id"])
 
-    # Fetch all podcasts for the user
-    podcasts = db.podcasts.find({"userID": user_id}, {"_id": 1, "status": 1, "prompt": 1})
+    # Fetch a page of the user's podcasts, newest first
+    try:
+        podcasts, next_cursor = await podcast_repo.page_for_user(
+            user_id,
+            {"status": 1, "prompt": 1},
+            cursor,
+            page_size(limit)
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    set_next_page_headers(response, request, next_cursor)
 
     # Create a list of podcast information
     podcast_list = [
@@ -135,14 +184,8 @@ async def get_user_podcasts(current_user: str = Depends(get_current_user)):
     return podcast_list
 
 @router.get("/get-cover/{podcast_id}")
-async def get_cover(podcast_id: str, current_user: str = Depends(get_current_user)):
-    db = get_db()
-    user = db.users.find_one({"email": current_user})
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    podcast = db.podcasts.find_one({"_id": ObjectId(podcast_id), "userID": str(user["_id"])})
+async def get_cover(podcast_id: str, user: dict = Depends(get_current_user_doc)):
+    podcast = await podcast_repo.find_for_user(podcast_id, str(user["_id"]))
 
     if not podcast:
         raise HTTPException(status_code=404, detail="Podcast not found")
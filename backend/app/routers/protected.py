@@ -15,7 +15,7 @@ async def paid_feature(
     days: int = Query(30, ge=1, description="Number of days since last payment")
 ):
     try:
-        is_paid = get_paid_user(current_user, days)
+        is_paid = await get_paid_user(current_user, days)
         return {
             "message": f"This is a paid feature (last payment within {days} days)",
             "user": current_user
@@ -29,7 +29,7 @@ async def credit_based_feature(
     credits_required: float = Query(1.0, ge=0, description="Number of credits required for this operation")
 ):
     try:
-        check_and_deduct_credits(current_user, credits_required)
+        await check_and_deduct_credits(current_user, credits_required)
         return {
             "message": f"This is a credit-based feature (cost: {credits_required} credits)",
             "user": current_user
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests import the app's modules the way main.py does, from backend/app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# replicate_utils refuses to import without a token, and the pipeline imports it
+os.environ.setdefault("REPLICATE_API_TOKEN", "test")
@@ -0,0 +1,90 @@
+import struct
+import wave
+from datetime import timedelta
+
+import pytest
+
+import utils.audio_assembly as audio_assembly
+from utils.audio_assembly import WavAssembler, wav_header
+
+def write_clip(path, frames, framerate=22050, channels=1, sample_width=2, value=0):
+    """A PCM WAV of frames frames, every sample set to value"""
+    sample = value.to_bytes(sample_width, "little", signed=sample_width > 1)
+    with wave.open(str(path), "wb") as clip:
+        clip.setnchannels(channels)
+        clip.setsampwidth(sample_width)
+        clip.setframerate(framerate)
+        clip.writeframes(sample * channels * frames)
+    return str(path)
+
+def header_sizes(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    riff_size = struct.unpack_from("<I", data, 4)[0]
+    data_size = struct.unpack_from("<I", data, data.index(b"data") + 4)[0]
+    return len(data), riff_size, data_size
+
+def test_assembled_clips_read_back(tmp_path, monkeypatch):
+    # Small chunks, so clips are copied over several reads
+    monkeypatch.setattr(audio_assembly, "CHUNK_FRAMES", 1000)
+    clips = [write_clip(tmp_path / f"{i}.wav", frames, value=i + 1) for i, frames in enumerate([4410, 2205, 7000])]
+    output = str(tmp_path / "out.wav")
+
+    with WavAssembler(output) as assembler:
+        for clip in clips:
+            assembler.append(clip)
+
+    with wave.open(output, "rb") as result:
+        assert (result.getnchannels(), result.getsampwidth(), result.getframerate()) == (1, 2, 22050)
+        assert result.getnframes() == 4410 + 2205 + 7000
+        samples = struct.unpack(f"<{result.getnframes()}h", result.readframes(result.getnframes()))
+    assert samples == (1,) * 4410 + (2,) * 2205 + (3,) * 7000
+
+def test_header_patched_after_each_append(tmp_path):
+    output = str(tmp_path / "out.wav")
+    assembler = WavAssembler(output)
+
+    for total in (1000, 3000):
+        assembler.append(write_clip(tmp_path / f"{total}.wav", total - assembler.frames_written))
+        # Valid up to the clip boundary while the assembler is still open
+        size, riff_size, data_size = header_sizes(output)
+        assert data_size == assembler.data_bytes == total * 2
+        assert riff_size == size - 8
+        assert assembler.data_offset == size - data_size
+        with open(output, "rb") as f:
+            assert f.read(assembler.data_offset) == wav_header(assembler.params, data_size)
+        with wave.open(output, "rb") as partial:
+            assert partial.getnframes() == total
+
+    assembler.close()
+    assert header_sizes(output)[2] == 3000 * 2
+
+def test_cue_offsets_exact_to_the_frame(tmp_path):
+    output = str(tmp_path / "out.wav")
+    # 1/3 second clips at 44.1 kHz: summing rounded durations would drift, frame counts don't
+    clip = write_clip(tmp_path / "third.wav", 14700, framerate=44100)
+
+    with WavAssembler(output) as assembler:
+        offsets = [assembler.append(clip) for _ in range(300)]
+
+    for i, (start, end) in enumerate(offsets):
+        assert start == timedelta(microseconds=i * 14700 * 1_000_000 // 44100)
+        assert end == timedelta(microseconds=(i + 1) * 14700 * 1_000_000 // 44100)
+        if i:
+            assert start == offsets[i - 1][1]
+    assert offsets[-1][1] == timedelta(seconds=100)
+
+@pytest.mark.parametrize("mismatch", [{"framerate": 44100}, {"channels": 2}, {"sample_width": 1}])
+def test_format_mismatch_rejected(tmp_path, mismatch):
+    output = str(tmp_path / "out.wav")
+    first = write_clip(tmp_path / "first.wav", 100)
+    other = write_clip(tmp_path / "other.wav", 100, **mismatch)
+
+    with WavAssembler(output) as assembler:
+        assembler.append(first)
+        with pytest.raises(ValueError, match="expected \\(1, 2, 22050\\)"):
+            assembler.append(other)
+        assert assembler.frames_written == 100
+
+    with wave.open(output, "rb") as result:
+        assert result.getnframes() == 100
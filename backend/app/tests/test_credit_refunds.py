@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+import utils.credit_operations as credit_operations
+
+USER_ID = ObjectId()
+
+class FakePodcasts:
+    """One failed podcast, claimed and finished the way the repository's queries do"""
+
+    def __init__(self):
+        self.podcast = {"_id": ObjectId(), "userID": str(USER_ID), "status": "error", "credits_reserved": 1}
+
+    async def claim_refund(self, podcast_id=None):
+        await asyncio.sleep(0)
+        if self.podcast["status"] != "error" or self.podcast["credits_reserved"] <= 0:
+            return None
+        self.podcast.setdefault("refund_id", ObjectId())
+        return dict(self.podcast)
+
+    async def finish_refund(self, podcast_id, refund_id):
+        await asyncio.sleep(0)
+        if self.podcast.get("refund_id") != refund_id:
+            return False
+        self.podcast.update(credits_reserved=0, credits_refunded=True)
+        del self.podcast["refund_id"]
+        return True
+
+class FakeUsers:
+    def __init__(self):
+        self.credits = 0
+        self.recent_refunds = []
+
+    async def apply_refund(self, user_id, refund_id, credits):
+        await asyncio.sleep(0)
+        if refund_id in self.recent_refunds:
+            return False
+        self.credits += credits
+        self.recent_refunds.append(refund_id)
+        return True
+
+@pytest.fixture
+def repos(monkeypatch):
+    podcasts, users = FakePodcasts(), FakeUsers()
+    monkeypatch.setattr(credit_operations, "podcast_repo", podcasts)
+    monkeypatch.setattr(credit_operations, "user_repo", users)
+    return podcasts, users
+
+def test_concurrent_refunds_pay_once(repos):
+    podcasts, users = repos
+
+    async def run():
+        return await asyncio.gather(*(credit_operations.refund_podcast_credits(podcasts.podcast["_id"]) for _ in range(3)))
+
+    assert sorted(asyncio.run(run())) == [0, 0, 1]
+    assert users.credits == 1
+    assert podcasts.podcast["credits_reserved"] == 0
+    assert asyncio.run(credit_operations.refund_podcast_credits(podcasts.podcast["_id"])) == 0
+    assert users.credits == 1
+
+@pytest.mark.parametrize("crash_in", ["apply_refund", "finish_refund"])
+def test_interrupted_refund_is_finished_once(repos, monkeypatch, crash_in):
+    podcasts, users = repos
+    target = users if crash_in == "apply_refund" else podcasts
+    original = getattr(target, crash_in)
+
+    # Before the user is credited, or after it but before the reservation is zeroed
+    async def crash(*args):
+        raise ConnectionError("lost the database")
+
+    monkeypatch.setattr(target, crash_in, crash)
+    with pytest.raises(ConnectionError):
+        asyncio.run(credit_operations.refund_podcast_credits(podcasts.podcast["_id"]))
+    assert podcasts.podcast["credits_reserved"] == 1
+
+    monkeypatch.setattr(target, crash_in, original)
+    assert asyncio.run(credit_operations.refund_podcast_credits(podcasts.podcast["_id"])) == 1
+    assert users.credits == 1
+    assert podcasts.podcast["credits_reserved"] == 0
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.file_response import RangeFileResponse
+
+CONTENT = bytes(range(256)) * 4
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "audio.wav"
+    path.write_bytes(CONTENT)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def serve(request: Request):
+        return RangeFileResponse(str(path), request.headers, media_type="audio/wav")
+
+    return TestClient(app)
+
+def test_plain_get(client):
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert response.headers["accept-ranges"] == "bytes"
+
+def test_single_range(client):
+    response = client.get("/file", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+def test_multiple_ranges(client):
+    response = client.get("/file", headers={"Range": "bytes=0-3,100-103"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1]
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert f"Content-Range: bytes 0-3/{len(CONTENT)}".encode() in response.content
+    assert f"Content-Range: bytes 100-103/{len(CONTENT)}".encode() in response.content
+    assert CONTENT[0:4] in response.content and CONTENT[100:104] in response.content
+    assert response.content.endswith(f"--{boundary}--\r\n".encode())
+
+def test_unsatisfiable_range(client):
+    response = client.get("/file", headers={"Range": f"bytes={len(CONTENT) + 10}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+def test_if_none_match(client):
+    etag = client.get("/file").headers["etag"]
+    response = client.get("/file", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
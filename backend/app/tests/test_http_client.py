@@ -0,0 +1,46 @@
+import asyncio
+
+import httpx
+import pytest
+
+import utils.http_client as http_client
+
+URL = "http://provider.test/v1/run"
+
+def _send(monkeypatch, method, outcome, headers=None):
+    """Send one request against a server answering with outcome, returns how many attempts it took"""
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if isinstance(outcome, type):
+            raise outcome("failed", request=request)
+        return httpx.Response(outcome)
+
+    monkeypatch.setitem(http_client._clients, "http://provider.test", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(http_client, "_retry_delay", lambda attempt, response=None: 0)
+    try:
+        asyncio.run(http_client.request(method, URL, retries=2, headers=headers))
+    except httpx.TransportError:
+        pass
+    return len(attempts)
+
+@pytest.mark.parametrize("method, outcome, headers, attempts", [
+    ("GET", 503, None, 3),
+    ("GET", httpx.ReadTimeout, None, 3),
+    # The server may have acted on a POST, only retried when it never got it or turned it away
+    ("POST", 503, None, 1),
+    ("POST", httpx.ReadTimeout, None, 1),
+    ("POST", httpx.ConnectError, None, 3),
+    ("POST", 429, None, 3),
+    ("POST", 503, {"Idempotency-Key": "abc"}, 3),
+    ("POST", 400, None, 1),
+])
+def test_retries(monkeypatch, method, outcome, headers, attempts):
+    assert _send(monkeypatch, method, outcome, headers) == attempts
+
+def test_retry_after_is_capped(monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_MAX_RETRY_AFTER", 30)
+    assert http_client.retry_after(httpx.Response(429, headers={"Retry-After": "5"})) == 5
+    assert http_client.retry_after(httpx.Response(429, headers={"Retry-After": "86400"})) == 30
+    assert http_client.retry_after(httpx.Response(429)) is None
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from utils.json_stream import RoundStreamParser
+
+DOCUMENT = json.dumps({
+    "rounds": [
+        {"speaker0": 'She said "hi" and left', "speaker1": "Back\\slash {not a round}"},
+        {"speaker0": "Nested", "meta": {"mood": {"tone": "calm"}}},
+        {"speaker1": "Unicode é and\nnewline"},
+    ]
+})
+
+def feed_all(parser, chunks):
+    rounds = []
+    for chunk in chunks:
+        rounds.extend(parser.feed(chunk))
+    return rounds
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(DOCUMENT)])
+def test_rounds_split_across_chunks(size):
+    chunks = [DOCUMENT[i:i + size] for i in range(0, len(DOCUMENT), size)]
+    assert feed_all(RoundStreamParser(), chunks) == [
+        {"speaker0": 'She said "hi" and left', "speaker1": "Back\\slash {not a round}"},
+        # Nested objects are not lines, only their braces are counted
+        {"speaker0": "Nested"},
+        {"speaker1": "Unicode é and\nnewline"},
+    ]
+
+def test_each_round_returned_as_soon_as_it_closes():
+    parser = RoundStreamParser()
+    assert parser.feed('{"ro') == []
+    assert parser.feed('unds": [{"speaker0": "Hi \\"') == []
+    assert parser.feed('}\\" there"') == []
+    assert parser.feed('}, {"speaker1"') == [{"speaker0": 'Hi "}" there'}]
+    assert parser.feed(': "Hello"}') == [{"speaker1": "Hello"}]
+
+def test_text_around_the_array_is_ignored():
+    parser = RoundStreamParser()
+    rounds = feed_all(parser, ['```json\n{"title": "{x}", "rou', 'nds": [{"speaker0": "A"}]', ', "tail": [{"speaker0": "B"}]}\n```'])
+    assert rounds == [{"speaker0": "A"}]
+    assert parser.feed('{"speaker0": "C"}') == []
+
+def test_unparseable_rounds_are_skipped():
+    parser = RoundStreamParser()
+    assert feed_all(parser, ['{"rounds": [{"speaker0": oops}, ', '{"speaker1": "Fine"}]}']) == [{"speaker1": "Fine"}]
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import pytest
+
+import utils.podcast_pipeline as podcast_pipeline
+from utils.llm_parsing import LLMOutputError, parse_structure, parse_transcript, repair_json
+
+STRUCTURE = {"1": {"topic": "Tides", "description": "Why the sea moves"}, "2": {"topic": "Waves", "description": "Wind"}}
+TRANSCRIPT = {"rounds": [{"speaker0": "Welcome", "speaker1": "Thanks"}, {"speaker0": "Bye"}]}
+
+@pytest.mark.parametrize("text, expected", [
+    # Truncated arrays and objects, cut back to the last complete value
+    ('{"rounds": [{"speaker0": "Hi"}, {"speaker1": "Hel', {"rounds": [{"speaker0": "Hi"}, {}]}),
+    ('{"rounds": [{"speaker0": "Hi"}', {"rounds": [{"speaker0": "Hi"}]}),
+    ('{"1": {"topic": "Tides"}, "2": {"topic"', {"1": {"topic": "Tides"}, "2": {}}),
+    ('{"1": {"topic": "Tides"}, "2":', {"1": {"topic": "Tides"}}),
+    ('{"count": 12', {}),
+    ('[1, 2, [3', [1, 2, []]),
+    # Trailing commas
+    ('{"rounds": [{"speaker0": "Hi",}, ],}', {"rounds": [{"speaker0": "Hi"}]}),
+    # Code fences
+    ('```json\n{"1": {"topic": "Tides"}}\n```', {"1": {"topic": "Tides"}}),
+    ('```\n[1, 2]\n```', [1, 2]),
+    # Text before and after the JSON
+    ('Here is the structure:\n{"1": {"topic": "Tides"}}\nEnjoy!', {"1": {"topic": "Tides"}}),
+    ('Sure! ```json\n{"a": "x } y"}\n``` Let me know.', {"a": "x } y"}),
+    # Escapes and brackets inside strings are left alone
+    ('{"speaker0": "She said \\"hi\\" {not json}"', {"speaker0": 'She said "hi" {not json}'}),
+])
+def test_repair_json(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+def test_repair_json_leaves_text_without_json():
+    assert repair_json("I can't help with that.") == "I can't help with that."
+
+def test_parse_structure_valid_and_repaired():
+    structure, repaired = parse_structure(json.dumps({**STRUCTURE, "3": {}, "4": {}, "5": {}}))
+    assert not repaired
+    assert structure["1"] == STRUCTURE["1"]
+
+    # Missing trailing slots are filled in, which counts as a repair
+    structure, repaired = parse_structure(json.dumps(STRUCTURE))
+    assert repaired
+    assert structure["5"] == {"topic": "", "description": ""}
+
+    structure, repaired = parse_structure('```json\n{"1": "Tides", "2": {"topic": "Waves",},}\n```')
+    assert repaired
+    assert structure["1"] == {"topic": "Tides", "description": ""}
+    assert structure["2"]["topic"] == "Waves"
+
+def test_parse_structure_rejects_unusable_output():
+    with pytest.raises(LLMOutputError):
+        parse_structure("I can't help with that.")
+    with pytest.raises(LLMOutputError):
+        parse_structure('{"1": {"topic": "  "}}')
+
+def test_parse_transcript_valid_and_repaired():
+    transcript, repaired = parse_transcript(json.dumps(TRANSCRIPT))
+    assert not repaired
+    assert transcript == TRANSCRIPT
+
+    # Cut short mid-round: the unfinished line is dropped, empty turns with it
+    transcript, repaired = parse_transcript('Transcript: {"rounds": [{"speaker0": "Welcome", "speaker1": "Tha')
+    assert repaired
+    assert transcript == {"rounds": [{"speaker0": "Welcome"}]}
+
+    transcript, _ = parse_transcript('[{"speaker0": "Hi", "speaker1": ""}, {}]')
+    assert transcript == {"rounds": [{"speaker0": "Hi"}]}
+
+def test_parse_transcript_rejects_unusable_output():
+    with pytest.raises(LLMOutputError):
+        parse_transcript('{"rounds": []}')
+    with pytest.raises(LLMOutputError):
+        parse_transcript('{"rounds": [{"speaker0": "Hel')
+
+@pytest.fixture
+def completions(tmp_path, monkeypatch):
+    """Completions handed out in order, and the ones that were cached"""
+    monkeypatch.chdir(tmp_path)
+    responses, cached = [], []
+
+    async def generate(messages):
+        return responses.pop(0)
+
+    async def no_cache(messages):
+        return None
+
+    async def cache(messages, content):
+        cached.append(content)
+
+    monkeypatch.setattr(podcast_pipeline, "generate_chat_completion", generate)
+    monkeypatch.setattr(podcast_pipeline, "cached_completion", no_cache)
+    monkeypatch.setattr(podcast_pipeline, "cache_completion", cache)
+    monkeypatch.setattr(podcast_pipeline, "LLM_STREAMING", False)
+    return responses, cached
+
+def test_structure_rerequested_only_when_repair_fails(completions):
+    responses, cached = completions
+    responses.extend(["I can't help with that.", '{"1": {"topic": "Tides"}, "2": {"topic": "Wa'])
+
+    result = asyncio.run(podcast_pipeline.generate_structure_stage({"prompt": "The sea"}))
+    assert result["structure_parsing"] == {"repaired": True, "attempts": 2}
+    assert result["podcast_structure"]["1"]["topic"] == "Tides"
+    assert not responses
+    assert cached == ['{"1": {"topic": "Tides"}, "2": {"topic": "Wa']
+
+def test_transcript_rerequested_only_when_repair_fails(completions):
+    responses, cached = completions
+    responses.extend(['{"rounds": []}', '```json\n' + json.dumps(TRANSCRIPT) + '\n```', "unused"])
+    podcast = {"_id": "podcast", "podcast_structure": STRUCTURE}
+
+    result = asyncio.run(podcast_pipeline.generate_transcription_stage(podcast))
+    assert result["transcription_parsing"] == {"repaired": True, "attempts": 2}
+    assert result["transcription"] == TRANSCRIPT
+    assert responses == ["unused"]
+    assert len(cached) == 1
+
+def test_gives_up_after_max_attempts(completions, monkeypatch):
+    responses, cached = completions
+    monkeypatch.setattr(podcast_pipeline, "LLM_MAX_ATTEMPTS", 2)
+    responses.extend(["no", "still no", "unused"])
+
+    with pytest.raises(Exception, match="after 2 attempts"):
+        asyncio.run(podcast_pipeline.generate_structure_stage({"prompt": "The sea"}))
+    assert responses == ["unused"]
+    assert not cached
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.podcast as podcast_router
+from utils.pagination import InvalidCursor, fetch_page
+from utils.security import get_current_user_doc
+
+class FakeCollection:
+    """Documents newest first, filtered on the _id bound fetch_page adds"""
+
+    def __init__(self, count):
+        documents = [{"_id": ObjectId(), "status": "ready", "prompt": str(i)} for i in range(count)]
+        self.documents = sorted(documents, key=lambda document: document["_id"], reverse=True)
+
+    def find(self, query, projection=None):
+        bound = query.get("_id", {}).get("$lt")
+        self.result = [document for document in self.documents if bound is None or document["_id"] < bound]
+        return self
+
+    def sort(self, key, direction):
+        return self
+
+    def limit(self, limit):
+        self.result = self.result[:limit]
+        return self
+
+    async def to_list(self):
+        return self.result
+
+def test_pages_follow_the_cursor():
+    collection = FakeCollection(5)
+
+    async def run():
+        first, cursor = await fetch_page(collection, {}, None, None, 2)
+        second, cursor = await fetch_page(collection, {}, None, cursor, 2)
+        third, cursor = await fetch_page(collection, {}, None, cursor, 2)
+        return first + second + third, cursor
+
+    documents, cursor = asyncio.run(run())
+    assert documents == collection.documents
+    assert cursor is None
+
+@pytest.mark.parametrize("cursor", ["not-an-id", "123"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        asyncio.run(fetch_page(FakeCollection(1), {}, None, cursor, 2))
+
+def test_invalid_cursor_is_a_bad_request(monkeypatch):
+    class FakePodcasts:
+        async def page_for_user(self, user_id, projection, cursor, limit, query=None):
+            return await fetch_page(FakeCollection(1), {}, projection, cursor, limit)
+
+    monkeypatch.setattr(podcast_router, "podcast_repo", FakePodcasts())
+    app = FastAPI()
+    app.include_router(podcast_router.router)
+    app.dependency_overrides[get_current_user_doc] = lambda: {"_id": ObjectId()}
+    client = TestClient(app)
+
+    response = client.get("/user-podcasts", params={"cursor": "not-an-id"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+    assert client.get("/user-podcasts").status_code == 200
@@ -0,0 +1,120 @@
+import asyncio
+import os
+
+import utils.tts_workers as tts_workers
+
+UTTERANCE = {"round": 0, "speaker": "speaker0", "voice": "Damien Black", "text": "Hello there"}
+
+def test_discard_deletes_saved_clip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def fake_speech(text, voice, language):
+        return b"RIFF"
+
+    monkeypatch.setattr(tts_workers, "generate_speech", fake_speech)
+
+    async def run():
+        task = tts_workers.start_synthesis(UTTERANCE, "en", "podcast")
+        audio_file = await task
+        assert os.path.exists(audio_file["filepath"])
+        tts_workers.discard_synthesis(task)
+        assert not os.path.exists(audio_file["filepath"])
+
+    asyncio.run(run())
+
+def test_discard_cancels_pending_synthesis(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    started = asyncio.Event()
+
+    async def slow_speech(text, voice, language):
+        started.set()
+        await asyncio.sleep(10)
+        return b"RIFF"
+
+    monkeypatch.setattr(tts_workers, "generate_speech", slow_speech)
+
+    async def run():
+        task = tts_workers.start_synthesis(UTTERANCE, "en", "podcast")
+        await started.wait()
+        tts_workers.discard_synthesis(task)
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled()
+        audios = tmp_path / "audios"
+        assert not audios.exists() or not os.listdir(audios)
+
+    asyncio.run(run())
+
+def _stream_transcription_stage(monkeypatch, attempts, speech):
+    """Run the transcription stage on streamed attempts, returning it and every synthesis it started"""
+    import utils.podcast_pipeline as podcast_pipeline
+
+    started = {}
+
+    def start(utterance, language, podcast_id):
+        task = tts_workers.start_synthesis(utterance, language, podcast_id)
+        started[utterance["text"]] = task
+        return task
+
+    async def stream(messages):
+        for chunk in attempts.pop(0):
+            yield chunk
+            await asyncio.sleep(0.01)
+
+    async def no_cache(messages):
+        return None
+
+    monkeypatch.setattr(tts_workers, "generate_speech", speech)
+    monkeypatch.setattr(podcast_pipeline, "start_synthesis", start)
+    monkeypatch.setattr(podcast_pipeline, "stream_chat_completion", stream)
+    monkeypatch.setattr(podcast_pipeline, "cached_completion", no_cache)
+    monkeypatch.setattr(podcast_pipeline, "LLM_STREAMING", True)
+
+    podcast = {"_id": "podcast", "podcast_structure": {"1": {"topic": "Tides"}}, "use_llm_cache": False}
+    return podcast_pipeline.generate_transcription_stage(podcast), started
+
+# A round streams in, then the document turns out invalid: "rounds" is given again, as a number
+INVALID = ['{"rounds": [{"speaker0": "Stale', ' line"}, {"speaker1": "Shared line"}', '], "rounds": 2}']
+VALID = ['{"rounds": [{"speaker0": "Fresh line"}, ', '{"speaker1": "Shared line"}]}']
+
+def test_clips_of_invalid_transcript_are_deleted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def fake_speech(text, voice, language):
+        return b"RIFF"
+
+    stage, started = _stream_transcription_stage(monkeypatch, [INVALID, VALID], fake_speech)
+
+    async def run():
+        result = await stage
+        await asyncio.gather(*started.values(), return_exceptions=True)
+        return result
+
+    result = asyncio.run(run())
+    assert result["transcription"]["rounds"] == [{"speaker0": "Fresh line"}, {"speaker1": "Shared line"}]
+    assert result["transcription_parsing"]["attempts"] == 2
+    assert sorted(os.listdir(tmp_path / "audios")) == sorted([
+        tts_workers.clip_filename({"round": 0, "speaker": "speaker0", "text": "Fresh line"}, "podcast"),
+        tts_workers.clip_filename({"round": 1, "speaker": "speaker1", "text": "Shared line"}, "podcast"),
+    ])
+
+def test_pending_clips_of_invalid_transcript_are_cancelled(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def slow_speech(text, voice, language):
+        await asyncio.sleep(0 if text == "Fresh line" else 10)
+        return b"RIFF"
+
+    stage, started = _stream_transcription_stage(monkeypatch, [INVALID, VALID], slow_speech)
+
+    async def run():
+        result = await stage
+        stale = started["Stale line"]
+        await asyncio.gather(stale, return_exceptions=True)
+        assert stale.cancelled()
+        # Discarded with the invalid attempt, then started again for the valid one
+        assert not started["Shared line"].done()
+        started["Shared line"].cancel()
+        await asyncio.gather(started["Shared line"], return_exceptions=True)
+        return result
+
+    assert asyncio.run(run())["transcription_parsing"]["attempts"] == 2
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.podcast as podcast_router
+from utils.audio_assembly import compiled_audio_path, partial_audio_path, wav_header
+from utils.security import get_current_user_doc
+
+USER = {"_id": ObjectId()}
+FORMAT = (1, 2, 22050)
+AUDIO = bytes(range(256)) * 8
+
+class FakePodcasts:
+    """Hands out the podcast as it was when looked up, then as it is after assembly finished"""
+
+    def __init__(self, *versions):
+        self.versions = list(versions)
+
+    async def find_for_user(self, podcast_id, user_id):
+        return self.versions.pop(0) if len(self.versions) > 1 else self.versions[0]
+
+@pytest.fixture
+def podcast(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("compiled_audios")
+    podcast_id = ObjectId()
+    # Published up to a clip boundary, the file already holds more
+    progress = {"audio_path": partial_audio_path(str(podcast_id)), "format": list(FORMAT), "data_offset": 44, "published_bytes": 1024}
+    return {"_id": podcast_id, "status": "generating_audio", "progress": progress}
+
+def get(podcasts, podcast, monkeypatch):
+    monkeypatch.setattr(podcast_router, "podcast_repo", podcasts)
+    app = FastAPI()
+    app.include_router(podcast_router.router)
+    app.dependency_overrides[get_current_user_doc] = lambda: USER
+    return TestClient(app).get(f"/stream-audio/{podcast['_id']}", headers={"Accept": "audio/wav"})
+
+def write_wav(path):
+    with open(path, "wb") as f:
+        f.write(wav_header(FORMAT, len(AUDIO)) + AUDIO)
+
+def test_partial_audio_served_while_generating(podcast, monkeypatch):
+    write_wav(partial_audio_path(str(podcast["_id"])))
+    response = get(FakePodcasts(podcast), podcast, monkeypatch)
+    assert response.status_code == 200
+    assert response.content == wav_header(FORMAT, 1024) + AUDIO[:1024]
+    assert response.headers["x-podcast-status"] == "generating_audio"
+
+def test_partial_audio_renamed_by_assembly(podcast, monkeypatch):
+    # Looked up before assembly, the file was renamed before it was opened
+    write_wav(compiled_audio_path(str(podcast["_id"])))
+    response = get(FakePodcasts({**podcast, "status": "assembling_audio"}), podcast, monkeypatch)
+    assert response.status_code == 200
+    assert response.content == wav_header(FORMAT, 1024) + AUDIO[:1024]
+
+def test_partial_audio_gone_once_ready(podcast, monkeypatch):
+    # Assembled and transcoded since the lookup, the WAV kept as the only rendition
+    ready = {"_id": podcast["_id"], "status": "ready", "renditions": {}, "compiled_audio_path": "compiled_audios/final.wav"}
+    write_wav(ready["compiled_audio_path"])
+    response = get(FakePodcasts(podcast, ready), podcast, monkeypatch)
+    assert response.status_code == 200
+    assert response.content == wav_header(FORMAT, len(AUDIO)) + AUDIO
+
+def test_partial_audio_missing(podcast, monkeypatch):
+    response = get(FakePodcasts(podcast), podcast, monkeypatch)
+    assert response.status_code == 400
@@ -0,0 +1,28 @@
+import asyncio
+
+import stripe
+
+import utils.stripe_inbox as stripe_inbox
+
+def test_record_event_reads_webhook_session(monkeypatch):
+    recorded = []
+
+    async def record(event):
+        recorded.append(event)
+        return True
+
+    monkeypatch.setattr(stripe_inbox.payment_repo, "record_event", record)
+    # What stripe.Webhook.construct_event returns, a StripeObject rather than a dict
+    event = stripe.Event.construct_from({
+        "id": "evt_1",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "id": "cs_1", "object": "checkout.session", "metadata": {"user_id": "abc"}, "amount_total": 500
+        }}
+    }, "sk_test")
+
+    assert asyncio.run(stripe_inbox.record_event(event.to_dict()))
+    assert recorded[0]["_id"] == "evt_1"
+    assert recorded[0]["session_id"] == "cs_1"
+    assert recorded[0]["user_id"] == "abc"
+    assert recorded[0]["amount_total"] == 500
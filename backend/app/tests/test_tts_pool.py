@@ -0,0 +1,27 @@
+import asyncio
+
+from utils.tts_pool import TTSPool
+
+def test_first_request_probes_every_node(monkeypatch):
+    pool = TTSPool(["http://up.test", "http://down.test"])
+    probed = []
+
+    async def probe(node):
+        probed.append(node.url)
+        if node.url == "http://down.test":
+            pool._eject(node, "health check failed")
+            return False
+        return True
+
+    monkeypatch.setattr(pool, "probe", probe)
+
+    async def run():
+        used = []
+        for _ in range(4):
+            async with pool.use() as node:
+                used.append(node.url)
+        return used
+
+    assert asyncio.run(run()) == ["http://up.test"] * 4
+    # Once per process, not per request
+    assert sorted(probed) == ["http://down.test", "http://up.test"]
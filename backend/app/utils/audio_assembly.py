@@ -0,0 +1,107 @@
+import struct
+import wave
+from datetime import timedelta
+from typing import Optional, Tuple
+
+# Frames copied per read, keeps memory flat regardless of clip length
+CHUNK_FRAMES = 64 * 1024
+
+def partial_audio_path(podcast_id: str) -> str:
+    """The WAV the audio stage grows clip by clip, served while the podcast is generating"""
+    return f"compiled_audios/{podcast_id}_partial.wav"
+
+def compiled_audio_path(podcast_id: str) -> str:
+    """The finished WAV, which assembly renames the partial file to"""
+    return f"compiled_audios/{podcast_id}_compiled.wav"
+
+class WavAssembler:
+    """
+    Concatenate PCM WAV clips into a single file by streaming frames.
+
+    Every clip must share the first clip's channel count, sample width and frame
+    rate. Offsets are derived from frame counts, so timestamps stay exact no
+    matter how many clips are appended.
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.frames_written = 0
+        self.data_offset = 0
+        self._params: Optional[Tuple[int, int, int]] = None
+        self._file = None
+        self._output: Optional[wave.Wave_write] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def params(self) -> Optional[Tuple[int, int, int]]:
+        """(channels, sample width, frame rate) of the output, once the first clip is in"""
+        return self._params
+
+    @property
+    def framerate(self) -> int:
+        return self._params[2] if self._params else 0
+
+    @property
+    def data_bytes(self) -> int:
+        return self.frames_written * self._params[0] * self._params[1] if self._params else 0
+
+    def offset(self) -> timedelta:
+        if not self._params:
+            return timedelta(0)
+        return timedelta(microseconds=self.frames_written * 1_000_000 // self.framerate)
+
+    def append(self, clip_path: str) -> Tuple[timedelta, timedelta]:
+        """
+        Append a clip and return its (start, end) offsets in the output.
+        """
+        with wave.open(clip_path, "rb") as clip:
+            params = (clip.getnchannels(), clip.getsampwidth(), clip.getframerate())
+
+            if self._params is None:
+                self._params = params
+                self._file = open(self.output_path, "wb")
+                self._output = wave.open(self._file, "wb")
+                self._output.setnchannels(params[0])
+                self._output.setsampwidth(params[1])
+                self._output.setframerate(params[2])
+            elif params != self._params:
+                raise ValueError(
+                    f"Clip {clip_path} has format (channels, sample width, rate) {params}, "
+                    f"expected {self._params}"
+                )
+
+            start = self.offset()
+            while frames := clip.readframes(CHUNK_FRAMES):
+                self._output.writeframesraw(frames)
+                self.frames_written += len(frames) // (params[0] * params[1])
+
+        # writeframes patches the header sizes, so the file on disk is a valid WAV
+        # ending at this clip's boundary until the next append starts
+        self._output.writeframes(b"")
+        self._file.flush()
+        self.data_offset = self._file.tell() - self.data_bytes
+
+        return start, self.offset()
+
+    def close(self) -> None:
+        if self._output:
+            # Patches the RIFF/data sizes in the header now that the length is known
+            self._output.close()
+            self._file.close()
+            self._output = None
+
+def wav_header(params: Tuple[int, int, int], data_bytes: int) -> bytes:
+    """Canonical 44-byte PCM WAV header for data_bytes of audio in the given format"""
+    channels, sample_width, framerate = params
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, channels, framerate,
+        framerate * channels * sample_width, channels * sample_width, sample_width * 8,
+        b"data", data_bytes
+    )
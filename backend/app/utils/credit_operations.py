@@ -1,19 +1,58 @@
+from bson import ObjectId
 from fastapi import HTTPException
-from database import get_db
+from repositories import podcast_repo, user_repo
+from utils.user_cache import user_cache
 
-def check_and_deduct_credits(user_email: str, required_credits: float):
-    db = get_db()
-    user = db.users.find_one({"email": user_email})
+async def check_and_deduct_credits(user_email: str, required_credits: float):
+    if await user_repo.deduct_credits({"email": user_email}, required_credits):
+        user_cache.invalidate(email=user_email)
+        return True
 
-    if not user:
+    # Only the failure path needs a second look, to tell the two errors apart
+    if not await user_repo.find_by_email(user_email):
         raise HTTPException(status_code=404, detail="User not found")
+    raise HTTPException(status_code=403, detail="Insufficient credits")
 
-    if user.get("credits", 0) < required_credits:
-        raise HTTPException(status_code=403, detail="Insufficient credits")
+async def reserve_credits(user_id: ObjectId, credits: float) -> bool:
+    """Atomically take credits from a user for a job, False if their balance is too low"""
+    if credits <= 0:
+        return True
+    if not await user_repo.deduct_credits({"_id": user_id}, credits):
+        return False
+    user_cache.invalidate(user_id=user_id)
+    return True
 
-    db.users.update_one(
-        {"_id": user["_id"]},
-        {"$inc": {"credits": -required_credits}}
-    )
+async def release_credits(user_id: ObjectId, credits: float) -> None:
+    """Give back credits reserved for a job that never ran"""
+    if credits > 0:
+        await user_repo.add_credits(user_id, credits)
+        user_cache.invalidate(user_id=user_id)
 
-    return True
\ No newline at end of file
+async def refund_podcast_credits(podcast_id=None) -> float:
+    """
+    Refund the credits reserved by a podcast that ended in error (or by any
+    such podcast when podcast_id is None).
+
+    The reservation is tagged with a refund id, the user is credited under
+    that id, then the reservation is zeroed. Each step can be repeated, so a
+    refund interrupted anywhere is finished by the next call (the worker's
+    sweep, at the latest) and never paid twice, however many callers race.
+
+    :return: the amount refunded, 0 if there was nothing to refund or another caller finished it
+    """
+    podcast = await podcast_repo.claim_refund(podcast_id)
+    if not podcast:
+        return 0
+    user_id = ObjectId(podcast["userID"])
+    if await user_repo.apply_refund(user_id, podcast["refund_id"], podcast["credits_reserved"]):
+        user_cache.invalidate(user_id=user_id)
+    if not await podcast_repo.finish_refund(podcast["_id"], podcast["refund_id"]):
+        return 0
+    return podcast["credits_reserved"]
+
+async def refund_failed_podcasts() -> int:
+    """Refund every failed podcast still holding reserved credits, returns how many"""
+    refunded = 0
+    while await refund_podcast_credits():
+        refunded += 1
+    return refunded
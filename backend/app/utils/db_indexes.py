@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from config import JOB_MAX_ATTEMPTS, STRIPE_EVENT_RETENTION_DAYS
+from repositories.podcasts import _claimable
+from utils.job_queue import ACTIVE_STATUSES
+
+# collection -> indexes backing the queries the routers, worker and helpers run
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "password_resets": [
+        IndexModel([("token", ASCENDING)], name="token_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        # Mongo's TTL monitor deletes a token once expires_at is in the past
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "podcasts": [
+        # A user's podcasts, newest first
+        IndexModel([("userID", ASCENDING), ("_id", DESCENDING)], name="user_podcasts"),
+        # Job queue claims: active statuses, oldest first
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="job_queue"),
+        # Failed podcasts whose credits are still to be refunded
+        IndexModel([("status", ASCENDING), ("credits_reserved", ASCENDING)], name="pending_refunds"),
+        # The episodes of a series, in order
+        IndexModel(
+            [("series_id", ASCENDING), ("episode", ASCENDING)],
+            name="series_episodes",
+            partialFilterExpression={"series_id": {"$exists": True}}
+        ),
+    ],
+    "payments": [
+        IndexModel([("payment_id", ASCENDING)], name="payment_id_unique", unique=True),
+        # Payment history, newest first
+        IndexModel([("user_id", ASCENDING), ("_id", DESCENDING)], name="user_payments"),
+        # Paid feature check: a recent payment in a given status
+        IndexModel(
+            [("user_id", ASCENDING), ("status", ASCENDING), ("payment_date", DESCENDING)],
+            name="user_status_date"
+        ),
+    ],
+    "llm_cache": [
+        # Each entry carries its own expiry
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "stripe_events": [
+        # Inbox of webhook events still to apply, oldest first (the event id is the _id)
+        IndexModel([("status", ASCENDING), ("received_at", ASCENDING)], name="inbox"),
+        # Handled events only need to outlive Stripe's redelivery window
+        IndexModel(
+            [("processed_at", ASCENDING)],
+            name="processed_at_ttl",
+            expireAfterSeconds=STRIPE_EVENT_RETENTION_DAYS * 24 * 3600
+        ),
+    ],
+}
+
+async def ensure_indexes(db) -> None:
+    """
+    Create any missing index. Existing ones are left alone, so this is cheap to
+    run on every startup. A failure (e.g. duplicates already in a collection
+    that should be unique) is reported without stopping the application.
+    """
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection].create_indexes([index])
+            except OperationFailure as e:
+                print(f"Could not create index {collection}.{index.document['name']}: {str(e)}")
+
+async def _sample(db, collection: str, field: str, default):
+    document = await db[collection].find_one({field: {"$exists": True}}, {field: 1})
+    return document[field] if document else default
+
+async def hot_queries(db) -> List[dict]:
+    """
+    The queries the application runs most, filled in with values taken from
+    existing documents so the plans reflect real data.
+    """
+    now = datetime.utcnow()
+    user_id = await _sample(db, "users", "_id", ObjectId())
+    email = await _sample(db, "users", "email", "nobody@example.com")
+    podcast_id = await _sample(db, "podcasts", "_id", ObjectId())
+    podcast_user = await _sample(db, "podcasts", "userID", str(user_id))
+    series_id = await _sample(db, "podcasts", "series_id", str(ObjectId()))
+    payment_user = await _sample(db, "payments", "user_id", user_id)
+    payment_id = await _sample(db, "payments", "payment_id", "cs_unknown")
+
+    return [
+        {"name": "user by email", "collection": "users", "filter": {"email": email}},
+        # Expiry is checked on the returned document, the query is on the token alone
+        {"name": "reset token", "collection": "password_resets", "filter": {"token": "unknown"}},
+        {"name": "user podcasts", "collection": "podcasts", "filter": {"userID": podcast_user},
+         "sort": [("_id", DESCENDING)]},
+        {"name": "user podcast by id", "collection": "podcasts",
+         "filter": {"_id": podcast_id, "userID": podcast_user}},
+        {"name": "job queue claim", "collection": "podcasts",
+         "filter": {**_claimable(ACTIVE_STATUSES, now), "attempts": {"$lt": JOB_MAX_ATTEMPTS}},
+         "sort": [("_id", ASCENDING)], "limit": 1},
+        {"name": "series episodes", "collection": "podcasts", "filter": {"series_id": series_id},
+         "sort": [("episode", ASCENDING)]},
+        {"name": "payment by id", "collection": "payments", "filter": {"payment_id": payment_id}},
+        {"name": "user payments", "collection": "payments", "filter": {"user_id": payment_user},
+         "sort": [("_id", DESCENDING)], "limit": 10},
+        {"name": "recent paid payment", "collection": "payments",
+         "filter": {
+             "user_id": payment_user,
+             "status": "approved",
+             "payment_date": {"$gte": now - timedelta(days=30)}
+         }, "limit": 1},
+        {"name": "stripe inbox", "collection": "stripe_events", "filter": {"status": "pending"},
+         "sort": [("received_at", ASCENDING)], "limit": 100},
+    ]
+
+def _plan_stages(plan: dict, stages: Optional[List[str]] = None) -> List[str]:
+    """Flatten a winning plan into "STAGE" / "IXSCAN(index)" labels, outermost first"""
+    if stages is None:
+        stages = []
+    label = plan.get("stage", "?")
+    if "indexName" in plan:
+        label += f"({plan['indexName']})"
+    stages.append(label)
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            _plan_stages(child, stages)
+    return stages
+
+async def explain_query(db, query: dict) -> dict:
+    cursor = db[query["collection"]].find(query["filter"])
+    if query.get("sort"):
+        cursor = cursor.sort(query["sort"])
+    if query.get("limit"):
+        cursor = cursor.limit(query["limit"])
+    explanation = await cursor.explain()
+
+    planner = explanation.get("queryPlanner", {})
+    # Sharded and newer (SBE) servers nest the plan one level deeper
+    winning_plan = planner.get("winningPlan", {})
+    winning_plan = winning_plan.get("queryPlan", winning_plan)
+    stats = explanation.get("executionStats", {})
+    return {
+        "plan": _plan_stages(winning_plan),
+        "returned": stats.get("nReturned"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "time_ms": stats.get("executionTimeMillis"),
+    }
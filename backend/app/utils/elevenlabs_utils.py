@@ -1,9 +1,10 @@
+import asyncio
 import os
 from typing import Optional, List, Dict, Any
-import requests
-
-# Constants for Coqui TTS API
-COQUI_API_URL = "http://[::1]:5002"
+from utils.http_client import request
+from utils.rate_limiter import get_limiter
+from utils.tts_cache import tts_cache
+from utils.tts_pool import tts_pool
 
 # Available voices in Coqui TTS
 AVAILABLE_VOICES = [
@@ -33,13 +34,21 @@ AVAILABLE_VOICES = [
 DEFAULT_HOST_VOICE = "Damien Black"
 DEFAULT_GUEST_VOICE = "Sofia Hellen"
 
-def generate_speech(text: str, speaker_name: Optional[str] = None, language: str = "en") -> bytes:
+async def generate_speech(text: str, speaker_name: Optional[str] = None, language: str = "en") -> bytes:
     """
-    Generate speech using Coqui TTS API
+    Generate speech using Coqui TTS API, reusing previously synthesized clips.
+    Each synthesis goes to the least loaded healthy server of the TTS pool.
     """
     # Use default host voice if no speaker specified
     speaker = speaker_name if speaker_name in AVAILABLE_VOICES else DEFAULT_HOST_VOICE
 
+    cache_key = None
+    if tts_cache:
+        cache_key = tts_cache.make_key(text, speaker, language)
+        cached_audio = await asyncio.to_thread(tts_cache.get, cache_key)
+        if cached_audio is not None:
+            return cached_audio
+
     params = {
         "text": text,
         "speaker_id": speaker,
@@ -47,12 +56,15 @@ def generate_speech(text: str, speaker_name: Optional[str] = None, language: str
         "style_wav": ""
     }
 
-    response = requests.get(f"{COQUI_API_URL}/api/tts", params=params)
-
-    if response.status_code == 200:
-        return response.content
+    async with tts_pool.use(cost=len(text)) as node:
+        # Synthesis time grows with the text, so latency is judged per character
+        response = await request("GET", f"{node.url}/api/tts", limiter=get_limiter(node.url), cost=len(text), params=params)
+        if response.status_code != 200:
+            raise Exception(f"Error calling Coqui TTS API at {node.url}: {response.status_code} - {response.text}")
 
-    raise Exception(f"Error calling Coqui TTS API: {response.status_code} - {response.text}")
+    if cache_key:
+        await asyncio.to_thread(tts_cache.put, cache_key, response.content)
+    return response.content
 
 def get_available_voices() -> List[Dict[str, Any]]:
     """
@@ -65,6 +77,8 @@ def save_audio(audio_content: bytes, filename: str) -> str:
     """Save audio content to a WAV file"""
     os.makedirs("audios", exist_ok=True)
     filepath = f"audios/{filename}"
-    with open(filepath, "wb") as f:
+    # Write then rename, a clip on disk is always complete (resumed runs rely on it)
+    with open(f"{filepath}.tmp", "wb") as f:
         f.write(audio_content)
+    os.replace(f"{filepath}.tmp", filepath)
     return filepath
\ No newline at end of file
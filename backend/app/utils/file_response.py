@@ -0,0 +1,229 @@
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Mapping, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# Read size when the server can't send file data zero-copy
+CHUNK_SIZE = 1024 * 1024
+# Above this many ranges a request is answered with the whole file instead
+MAX_RANGES = 16
+
+class RangeFileResponse(Response):
+    """
+    Serve a file, or a region of it, with Range and conditional request support.
+
+    The body is prefix + file[offset:offset + length]; the prefix lets callers
+    replace a file's header (e.g. for a WAV that is still growing). Handles
+    single and multiple byte ranges (206, multipart/byteranges), If-Range,
+    If-None-Match and If-Modified-Since. File bytes go through the ASGI
+    zerocopysend/pathsend extensions when the server offers them, so they never
+    pass through Python; otherwise they are read in a threadpool.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        request_headers: Headers,
+        media_type: str,
+        headers: Optional[Mapping[str, str]] = None,
+        prefix: bytes = b"",
+        offset: int = 0,
+        length: Optional[int] = None,
+    ):
+        stat = os.stat(path)
+        self.path = path
+        self.prefix = prefix
+        self.offset = offset
+        self.length = stat.st_size - offset if length is None else length
+        self.size = len(prefix) + self.length
+        self.media_type = media_type
+        self.background = None
+        self.body = b""
+        self.ranges: List[Tuple[int, int]] = []
+
+        # init_headers reads status_code, the real one is set below
+        self.status_code = 200
+
+        etag = f'"{stat.st_mtime_ns:x}-{self.size:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.init_headers({
+            **(headers or {}),
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": last_modified,
+        })
+
+        if self._not_modified(request_headers, etag, stat.st_mtime):
+            self.status_code = 304
+            del self.headers["content-length"]
+            return
+
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(request_headers.get("if-range"), etag, last_modified):
+            ranges = self._parse_ranges(range_header)
+            if ranges is None:
+                # Malformed or too many ranges: ignore the header, as RFC 9110 allows
+                pass
+            elif not ranges:
+                self.status_code = 416
+                self.headers["content-range"] = f"bytes */{self.size}"
+                self.headers["content-length"] = "0"
+                return
+            else:
+                self.ranges = ranges
+
+        if not self.ranges:
+            self.status_code = 200
+            self.headers["content-type"] = media_type
+            self.headers["content-length"] = str(self.size)
+        elif len(self.ranges) == 1:
+            start, end = self.ranges[0]
+            self.status_code = 206
+            self.headers["content-type"] = media_type
+            self.headers["content-range"] = f"bytes {start}-{end}/{self.size}"
+            self.headers["content-length"] = str(end - start + 1)
+        else:
+            self.status_code = 206
+            self.boundary = secrets.token_hex(16)
+            self.headers["content-type"] = f"multipart/byteranges; boundary={self.boundary}"
+            # Each part is header + data + CRLF, then the closing boundary
+            self.headers["content-length"] = str(
+                sum(len(self._part_header(start, end)) + end - start + 3 for start, end in self.ranges)
+                + len(self._closing_boundary())
+            )
+
+    @staticmethod
+    def _not_modified(request_headers: Headers, etag: str, mtime: float) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _if_range_matches(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+        return if_range is None or if_range.strip() in (etag, last_modified)
+
+    def _parse_ranges(self, range_header: str) -> Optional[List[Tuple[int, int]]]:
+        """
+        Parse a bytes Range header into sorted, merged inclusive (start, end) pairs.
+
+        Returns None if the header should be ignored and an empty list if no
+        range can be satisfied.
+        """
+        unit, _, specs = range_header.partition("=")
+        if unit.strip().lower() != "bytes" or not specs:
+            return None
+
+        specs = [spec.strip() for spec in specs.split(",") if spec.strip()]
+        if not specs or len(specs) > MAX_RANGES:
+            return None
+
+        ranges = []
+        for spec in specs:
+            start, sep, end = spec.partition("-")
+            if not sep:
+                return None
+            try:
+                if not start:
+                    # Suffix range: the last N bytes
+                    suffix = int(end)
+                    if suffix <= 0:
+                        continue
+                    ranges.append((max(0, self.size - suffix), self.size - 1))
+                    continue
+                start = int(start)
+                end = int(end) if end else None
+            except ValueError:
+                return None
+            if end is not None and start > end:
+                return None
+            if start < self.size:
+                ranges.append((start, self.size - 1 if end is None else min(end, self.size - 1)))
+
+        merged: List[Tuple[int, int]] = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _part_header(self, start: int, end: int) -> bytes:
+        return (
+            f"--{self.boundary}\r\n"
+            f"Content-Type: {self.media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n"
+        ).encode("latin-1")
+
+    def _closing_boundary(self) -> bytes:
+        return f"--{self.boundary}--\r\n".encode("latin-1")
+
+    async def _send_file_region(self, scope: Scope, send: Send, file, start: int, count: int) -> None:
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": file,
+                "offset": start,
+                "count": count,
+                "more_body": True,
+            })
+            return
+
+        await run_in_threadpool(file.seek, start)
+        while count > 0:
+            chunk = await run_in_threadpool(file.read, min(CHUNK_SIZE, count))
+            if not chunk:
+                break
+            count -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    async def _send_range(self, scope: Scope, send: Send, file, start: int, end: int) -> None:
+        """Send bytes start..end (inclusive) of the virtual prefix + file body"""
+        if start < len(self.prefix):
+            await send({"type": "http.response.body", "body": self.prefix[start:end + 1], "more_body": True})
+            start = len(self.prefix)
+        if start <= end:
+            file_start = self.offset + start - len(self.prefix)
+            await self._send_file_region(scope, send, file, file_start, end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if self.status_code in (304, 416):
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        whole_file = not self.ranges and not self.prefix and self.offset == 0
+        if whole_file and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+            return
+
+        with open(self.path, "rb") as file:
+            if not self.ranges:
+                await self._send_range(scope, send, file, 0, self.size - 1)
+            elif len(self.ranges) == 1:
+                await self._send_range(scope, send, file, *self.ranges[0])
+            else:
+                for start, end in self.ranges:
+                    await send({"type": "http.response.body", "body": self._part_header(start, end), "more_body": True})
+                    await self._send_range(scope, send, file, start, end)
+                    await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+                await send({"type": "http.response.body", "body": self._closing_boundary(), "more_body": False})
+                return
+
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
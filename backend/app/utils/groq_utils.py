@@ -1,44 +1,92 @@
+import json
 import os
-import requests
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional
+from config import OPENAI_COMPLETION_TOKENS_ESTIMATE
+from utils.http_client import request, stream
+from utils.llm_cache import llm_cache
+from utils.rate_limiter import get_limiter
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+OPENAI_MODEL = "gpt-4o"
 
-def generate_text(prompt: str, max_tokens: int = 100) -> str:
+async def generate_text(prompt: str, max_tokens: int = 100) -> str:
+    return await generate_chat_completion([{"role": "user", "content": prompt}])
+
+def _estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Tokens a request will use, about four characters per prompt token plus the expected completion"""
+    return sum(len(message["content"]) for message in messages) // 4 + OPENAI_COMPLETION_TOKENS_ESTIMATE
+
+async def cached_completion(messages: List[Dict[str, str]]) -> Optional[str]:
+    """A completion cached for the same messages, None on a miss or with the cache disabled"""
+    if llm_cache:
+        return await llm_cache.get(OPENAI_MODEL, messages)
+    return None
+
+async def cache_completion(messages: List[Dict[str, str]], content: str) -> None:
+    """Remember a freshly generated completion that passed validation, for cached_completion"""
+    if llm_cache:
+        await llm_cache.put(OPENAI_MODEL, messages, content)
+
+async def generate_chat_completion(messages: List[Dict[str, str]]) -> str:
     headers = {
         "Authorization": f"Bearer {OPENAI_API_KEY}",
         "Content-Type": "application/json"
     }
 
     data = {
-        "model": "gpt-4o",
-        "messages": [{"role": "user", "content": prompt}],
+        "model": OPENAI_MODEL,
+        "messages": messages,
         "response_format": {"type": "json_object"}
     }
 
-    response = requests.post(OPENAI_API_URL, headers=headers, json=data)
+    limiter = get_limiter("openai")
+    tokens = _estimate_tokens(messages)
+    response = await request("POST", OPENAI_API_URL, limiter=limiter, cost=tokens, tokens=tokens, headers=headers, json=data)
 
     if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
+        result = response.json()
+        limiter.settle_tokens(tokens, (result.get("usage") or {}).get("total_tokens", 0))
+        return result["choices"][0]["message"]["content"]
     else:
         raise Exception(f"Error calling OpenAI API: {response.status_code} - {response.text}")
 
-def generate_chat_completion(messages: List[Dict[str, str]]) -> str:
+async def stream_chat_completion(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """Stream a chat completion, yielding content deltas as the model writes them"""
     headers = {
         "Authorization": f"Bearer {OPENAI_API_KEY}",
         "Content-Type": "application/json"
     }
 
     data = {
-        "model": "gpt-4o",
+        "model": OPENAI_MODEL,
         "messages": messages,
-        "response_format": {"type": "json_object"}
+        "response_format": {"type": "json_object"},
+        "stream": True,
+        # A last chunk reports the tokens used, to settle the token budget
+        "stream_options": {"include_usage": True}
     }
 
-    response = requests.post(OPENAI_API_URL, headers=headers, json=data)
+    limiter = get_limiter("openai")
+    tokens = _estimate_tokens(messages)
+    async with stream("POST", OPENAI_API_URL, limiter=limiter, cost=tokens, tokens=tokens, headers=headers, json=data) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise Exception(f"Error calling OpenAI API: {response.status_code} - {body.decode(errors='replace')}")
 
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        raise Exception(f"Error calling OpenAI API: {response.status_code} - {response.text}")
+        # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+
+            event = json.loads(payload)
+            if event.get("usage"):
+                limiter.settle_tokens(tokens, event["usage"].get("total_tokens", 0))
+            choices = event.get("choices") or []
+            if choices:
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
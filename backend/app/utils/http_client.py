@@ -0,0 +1,156 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from config import (
+    HTTP_CONNECT_TIMEOUT, HTTP_KEEPALIVE_EXPIRY, HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_MAX_RETRIES, HTTP_MAX_RETRY_AFTER, HTTP_READ_TIMEOUT, HTTP_RETRY_BACKOFF
+)
+from utils.rate_limiter import ProviderLimiter
+
+# Responses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"}
+# Errors raised before the request reached the server, safe to retry for any method
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# One pooled client per origin (scheme, host, port), so each provider gets its own keep-alive pool
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+def _origin(url: str) -> str:
+    parsed = httpx.URL(url)
+    return f"{parsed.scheme}://{parsed.netloc.decode()}"
+
+def get_client(url: str) -> httpx.AsyncClient:
+    origin = _origin(url)
+    client = _clients.get(origin)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            follow_redirects=True
+        )
+        _clients[origin] = client
+    return client
+
+def _is_idempotent(method: str, kwargs: dict) -> bool:
+    headers = httpx.Headers(kwargs.get("headers"))
+    return method.upper() in IDEMPOTENT_METHODS or "idempotency-key" in headers
+
+def _should_retry(idempotent: bool, error: Optional[Exception] = None, response: Optional[httpx.Response] = None) -> bool:
+    """
+    Whether a failed attempt can be sent again. A POST without an
+    Idempotency-Key may have been acted on by the server, so it is only
+    retried when it never got there, or was turned away with a 429.
+    """
+    if error is not None:
+        return idempotent or isinstance(error, NOT_SENT_ERRORS)
+    return response.status_code in RETRY_STATUS_CODES and (idempotent or response.status_code == 429)
+
+def retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """A response's Retry-After in seconds, capped at HTTP_MAX_RETRY_AFTER"""
+    value = response.headers.get("retry-after") if response is not None else None
+    if value and value.isdigit():
+        return min(float(value), HTTP_MAX_RETRY_AFTER)
+    return None
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    delay = retry_after(response)
+    if delay is not None:
+        return delay
+    # Exponential backoff with full jitter
+    return random.uniform(0, HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+def _admit(limiter: Optional[ProviderLimiter], cost: float, tokens: float):
+    # Every attempt, retries included, waits for its own slot
+    return limiter.slot(cost, tokens) if limiter else nullcontext()
+
+async def request(
+    method: str,
+    url: str,
+    retries: int = HTTP_MAX_RETRIES,
+    limiter: Optional[ProviderLimiter] = None,
+    cost: float = 1,
+    tokens: float = 0,
+    **kwargs
+) -> httpx.Response:
+    """
+    Send a request through the pooled client for the url's host.
+
+    Connection errors, timeouts and RETRY_STATUS_CODES are retried with backoff,
+    within the limits of _should_retry for non-idempotent methods. Any other
+    response, including errors, is returned for the caller to handle.
+    With a limiter, each attempt first queues for the provider's budgets and
+    concurrency (see utils.rate_limiter), cost and tokens being what it uses of them.
+    """
+    client = get_client(url)
+    idempotent = _is_idempotent(method, kwargs)
+    for attempt in range(retries + 1):
+        try:
+            async with _admit(limiter, cost, tokens) as slot:
+                response = await client.request(method, url, **kwargs)
+                if slot:
+                    slot.observe(response)
+        except httpx.TransportError as e:
+            if attempt == retries or not _should_retry(idempotent, error=e):
+                raise
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+
+        if attempt == retries or not _should_retry(idempotent, response=response):
+            return response
+        await asyncio.sleep(_retry_delay(attempt, response))
+
+@asynccontextmanager
+async def stream(
+    method: str,
+    url: str,
+    retries: int = HTTP_MAX_RETRIES,
+    limiter: Optional[ProviderLimiter] = None,
+    cost: float = 1,
+    tokens: float = 0,
+    **kwargs
+) -> AsyncIterator[httpx.Response]:
+    """
+    Like request(), but yields the response before its body is read.
+
+    Retries only happen before the response starts; once the body is being
+    consumed, errors propagate to the caller. The limiter slot is held until
+    the body is done.
+    """
+    client = get_client(url)
+    idempotent = _is_idempotent(method, kwargs)
+    for attempt in range(retries + 1):
+        async with _admit(limiter, cost, tokens) as slot:
+            try:
+                response = await client.send(client.build_request(method, url, **kwargs), stream=True)
+            except httpx.TransportError as e:
+                if slot:
+                    slot.fail(e)
+                if attempt == retries or not _should_retry(idempotent, error=e):
+                    raise
+                response = None
+            else:
+                if slot:
+                    slot.observe(response)
+                if attempt == retries or not _should_retry(idempotent, response=response):
+                    try:
+                        yield response
+                    finally:
+                        await response.aclose()
+                    return
+                await response.aclose()
+
+        await asyncio.sleep(_retry_delay(attempt, response))
+
+async def close_clients() -> None:
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
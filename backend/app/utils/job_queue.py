@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from config import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS
+from repositories import podcast_repo, series_repo
+
+# Statuses a podcast goes through while its pipeline is running
+ACTIVE_STATUSES = [
+    "pending", "generating_cover_art", "generating_structure",
+    "generating_transcription", "generating_audio", "assembling_audio"
+]
+
+# STRUCTURE_PROMPT asks for five topics, a series turns each into an episode
+SERIES_EPISODES = 5
+
+def _podcast_doc(user_id: str, content: str, language: str, credits_reserved: float, use_llm_cache: bool) -> dict:
+    return {
+        "prompt": content,
+        "language": language,
+        "userID": user_id,
+        "transcription": None,
+        "status": "pending",
+        "audio_files": [],
+        "attempts": 0,
+        # Reuse cached structure and transcript completions for identical prompts
+        "use_llm_cache": use_llm_cache,
+        # Refunded to the user if the podcast ends in error
+        "credits_reserved": credits_reserved,
+        "created_at": datetime.utcnow()
+    }
+
+async def enqueue_podcast(
+    user_id: str,
+    content: str,
+    language: str,
+    credits_reserved: float = 0,
+    use_llm_cache: bool = True
+) -> str:
+    """Insert a pending podcast document for a worker to claim"""
+    return await podcast_repo.insert(_podcast_doc(user_id, content, language, credits_reserved, use_llm_cache))
+
+async def enqueue_series(
+    user_id: str,
+    content: str,
+    language: str,
+    credits_per_episode: float = 0,
+    use_llm_cache: bool = True
+) -> str:
+    """
+    Insert a series and one podcast per episode.
+
+    Only episode 1 is claimable at first: it generates the cover art and the
+    structure for the whole series, then its "series" stage hands both to the
+    other episodes, which wait until then and run concurrently from there.
+    """
+    series_id = await series_repo.insert({
+        "prompt": content,
+        "language": language,
+        "userID": user_id,
+        "status": "pending",
+        "created_at": datetime.utcnow()
+    })
+
+    episodes = []
+    for episode in range(1, SERIES_EPISODES + 1):
+        podcast_doc = _podcast_doc(user_id, content, language, credits_per_episode, use_llm_cache)
+        podcast_doc.update({"series_id": series_id, "episode": episode})
+        if episode > 1:
+            podcast_doc["status"] = "waiting"
+        episodes.append(podcast_doc)
+
+    podcast_ids = await podcast_repo.insert_many(episodes)
+    await series_repo.update(series_id, {"$set": {"podcast_ids": podcast_ids}})
+    return series_id
+
+async def fail_waiting_episodes(series_id: Optional[str] = None) -> List[str]:
+    """
+    Fail the episodes still waiting on a series whose first episode failed before
+    sharing its structure (that series only, or any such series), so their
+    reserved credits are refunded instead of held forever.
+
+    Resuming the first episode brings them back, they can't be resumed on their own.
+
+    :return: the ids of the series that were failed
+    """
+    failed_series = await podcast_repo.find_failed_series(series_id)
+    if not failed_series:
+        return []
+
+    await podcast_repo.detach_waiting_episodes(
+        failed_series, "The series structure or cover art could not be generated"
+    )
+    await series_repo.set_status(failed_series, "error")
+    return failed_series
+
+async def detached_episodes(podcast: dict) -> List[dict]:
+    """The episodes a failed first episode of a series took down with it, to bring back when it is resumed"""
+    if not podcast.get("series_id") or podcast.get("episode", 1) != 1 or "series" in podcast.get("completed_stages", []):
+        return []
+    return await podcast_repo.find_detached_episodes(podcast["series_id"])
+
+async def reattach_episodes(series_id: str, credits_per_episode: float = 0) -> int:
+    """
+    Make the detached episodes of a series wait on its first episode again,
+    once their earlier reservation has been refunded, so they get the
+    structure the resumed first episode produces, never their own.
+
+    Call it before resume_podcast: once the first episode is queued, its
+    "series" stage may run at any moment and only releases waiting episodes.
+
+    :return: how many episodes were reattached
+    """
+    reattached = await podcast_repo.reattach_episodes(series_id, credits_per_episode)
+    if reattached:
+        await series_repo.update(series_id, {"$set": {"status": "pending"}})
+    return reattached
+
+async def detach_episodes(series_id: str) -> List[dict]:
+    """
+    Undo reattach_episodes when the first episode couldn't be resumed after
+    all: its episodes are detached again if it is still failed.
+
+    :return: the detached episodes, to refund
+    """
+    await fail_waiting_episodes(series_id)
+    return await podcast_repo.find_detached_episodes(series_id)
+
+async def claim_podcast_job(worker_id: str) -> Optional[dict]:
+    """
+    Lease the oldest claimable podcast to this worker.
+
+    A podcast is claimable when it is pending, or when it is mid-pipeline but the
+    worker holding it stopped renewing its lease (crash, restart, lost node).
+    That includes ready podcasts still to be transcoded (transcode_pending).
+    """
+    now = datetime.utcnow()
+    return await podcast_repo.claim_job(
+        ACTIVE_STATUSES, JOB_MAX_ATTEMPTS, worker_id, now, now + timedelta(seconds=JOB_LEASE_SECONDS)
+    )
+
+async def renew_lease(podcast_id: str, worker_id: str) -> bool:
+    """Heartbeat: extend the lease, returns False if this worker no longer holds it"""
+    return await podcast_repo.renew_lease(
+        podcast_id, worker_id, datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)
+    )
+
+async def release_podcast_job(podcast_id: str, worker_id: str) -> None:
+    await podcast_repo.release_lease(podcast_id, worker_id)
+
+async def fail_exhausted_jobs() -> int:
+    """
+    Give up on podcasts whose workers died JOB_MAX_ATTEMPTS times. Ready
+    podcasts whose transcoding did are left ready, with the WAV only.
+    """
+    now = datetime.utcnow()
+    await podcast_repo.abandon_transcoding(JOB_MAX_ATTEMPTS, now)
+    return await podcast_repo.fail_abandoned_jobs(
+        ACTIVE_STATUSES, JOB_MAX_ATTEMPTS, now, f"Generation abandoned after {JOB_MAX_ATTEMPTS} attempts"
+    )
+
+async def resume_podcast(
+    podcast_id: str,
+    user_id: Optional[str] = None,
+    credits_reserved: Optional[float] = None
+) -> bool:
+    """
+    Put a failed podcast back in the queue. Its completed stages are skipped
+    when a worker picks it up again.
+
+    credits_reserved records credits charged again for this run, so they are
+    refunded if it fails too. Left as None, the podcast keeps what it had.
+
+    Episodes detached from their series are refused: they only run with the
+    structure of their series, by resuming its first episode.
+    """
+    return await podcast_repo.requeue_failed(podcast_id, user_id, credits_reserved)
@@ -0,0 +1,78 @@
+import json
+import re
+from typing import List
+
+_ROUNDS_ARRAY = re.compile(r'"rounds"\s*:\s*\[')
+
+class RoundStreamParser:
+    """
+    Incremental parser for a streamed {"rounds": [{...}, {...}]} document.
+
+    feed() takes raw text chunks as they arrive and returns every round object
+    that closed within them. It only tracks string/escape state and brace depth,
+    so each chunk is scanned once. Rounds that fail to parse are skipped; the
+    caller is expected to parse the complete text at the end anyway.
+    """
+
+    def __init__(self):
+        self._prefix = ""
+        self._in_array = False
+        self._done = False
+        self._current: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        if self._done:
+            return []
+
+        if not self._in_array:
+            self._prefix += chunk
+            match = _ROUNDS_ARRAY.search(self._prefix)
+            if not match:
+                return []
+            self._in_array = True
+            chunk = self._prefix[match.end():]
+            self._prefix = ""
+
+        rounds = []
+        for char in chunk:
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._current = [char]
+                elif char == "]":
+                    self._done = True
+                    break
+                continue
+
+            self._current.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    round = self._parse_round("".join(self._current))
+                    if round:
+                        rounds.append(round)
+        return rounds
+
+    @staticmethod
+    def _parse_round(text: str):
+        try:
+            round = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(round, dict):
+            return None
+        return {speaker: line for speaker, line in round.items() if isinstance(line, str)}
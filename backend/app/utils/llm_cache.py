@@ -0,0 +1,96 @@
+import hashlib
+import json
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from config import LLM_CACHE_ENABLED, LLM_CACHE_TTL
+from database import get_db
+
+# Running totals live in one document of the cache collection; it has no expires_at, so the TTL index keeps it
+STATS_ID = "stats"
+
+class LLMCache:
+    """
+    MongoDB-backed cache of chat completions, keyed by model and the rendered
+    messages with whitespace and case normalized, so near-identical prompts
+    share an entry.
+
+    Entries expire through a TTL index on expires_at, which each entry sets
+    from its own TTL when it is created: hits don't extend it. Only freshly
+    generated completions that passed validation should be put, otherwise a
+    bad completion would be served again on every retry.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def collection(self):
+        return get_db().llm_cache
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]]) -> str:
+        normalized = [
+            {"role": message["role"], "content": " ".join(unicodedata.normalize("NFC", message["content"]).casefold().split())}
+            for message in messages
+        ]
+        payload = json.dumps({"model": model, "messages": normalized}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, model: str, messages: List[Dict[str, str]]) -> Optional[str]:
+        entry = await self.collection.find_one_and_update(
+            {"_id": self.make_key(model, messages), "expires_at": {"$gt": datetime.utcnow()}},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.utcnow()}},
+            projection={"response": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+        await self.collection.update_one(
+            {"_id": STATS_ID},
+            {"$inc": {"hits" if entry else "misses": 1}},
+            upsert=True
+        )
+        return entry["response"] if entry else None
+
+    async def put(self, model: str, messages: List[Dict[str, str]], response: str, ttl: Optional[int] = None) -> None:
+        now = datetime.utcnow()
+        # An entry already there keeps its response and its expiry, the first completion stored wins
+        await self.collection.update_one(
+            {"_id": self.make_key(model, messages)},
+            {
+                "$setOnInsert": {
+                    "model": model,
+                    "response": response,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl if ttl is None else ttl),
+                    "hits": 0
+                }
+            },
+            upsert=True
+        )
+
+    async def stats(self) -> dict:
+        """Hit rate of this process and of every process sharing the database"""
+        totals = await self.collection.find_one({"_id": STATS_ID}) or {}
+        hits, misses = totals.get("hits", 0), totals.get("misses", 0)
+        return {
+            "process": {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0
+            },
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": await self.collection.count_documents({"expires_at": {"$gt": datetime.utcnow()}})
+        }
+
+llm_cache = LLMCache(LLM_CACHE_TTL) if LLM_CACHE_ENABLED else None
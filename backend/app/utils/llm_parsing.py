@@ -0,0 +1,164 @@
+import json
+import re
+from collections import Counter
+from typing import List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from models.podcast import PodcastStructure, Transcript
+
+# kind -> outcome -> count, for this process. Outcomes:
+#   parsed: valid as returned, repaired: valid after local repair,
+#   failed: unusable, rerequested: another completion was requested because of it
+_stats = {"structure": Counter(), "transcript": Counter()}
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_LITERAL = re.compile(r"[^\s,\]\}:]+")
+
+class LLMOutputError(ValueError):
+    """A completion that is not usable even after repair"""
+
+def repair_json(text: str) -> str:
+    """
+    Turn near-valid JSON from a model into valid JSON where possible.
+
+    Handles code fences and prose around the object, trailing commas, and
+    output cut short (unterminated strings, missing closing brackets, a
+    dangling key): the text is cut back to the last complete value and the
+    open containers are closed.
+    """
+    text = _FENCE.sub("", text.strip())
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        return text
+
+    out: List[str] = []
+    # Open containers, each [bracket, what comes next: "key", "colon", "value" or "comma"]
+    stack: List[list] = []
+    # Output length and open brackets at the last point where closing them gives valid JSON
+    safe: Optional[Tuple[int, List[str]]] = None
+
+    def mark_safe():
+        nonlocal safe
+        safe = (len(out), [frame[0] for frame in stack])
+
+    def value_done():
+        if stack:
+            stack[-1][1] = "comma"
+        mark_safe()
+
+    i = start
+    while i < len(text):
+        char = text[i]
+        if char.isspace():
+            i += 1
+            continue
+
+        if char in "{[":
+            if stack and stack[-1][1] != "value":
+                break
+            stack.append([char, "key" if char == "{" else "value"])
+            out.append(char)
+            mark_safe()
+            i += 1
+        elif char in "}]":
+            if not stack or stack[-1][0] != ("{" if char == "}" else "["):
+                break
+            if stack[-1][1] in ("colon", "value") and char == "}":
+                break  # A key without a value
+            # Trailing comma before the bracket
+            if out and out[-1] == ",":
+                out.pop()
+            stack.pop()
+            out.append(char)
+            value_done()
+            if not stack:
+                return "".join(out)
+            i += 1
+        elif char == ",":
+            if not stack or stack[-1][1] != "comma":
+                i += 1
+                continue
+            stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+            out.append(char)
+            i += 1
+        elif char == ":":
+            if not stack or stack[-1][1] != "colon":
+                break
+            stack[-1][1] = "value"
+            out.append(char)
+            i += 1
+        elif char == '"':
+            end = i + 1
+            while end < len(text) and text[end] != '"':
+                end += 2 if text[end] == "\\" else 1
+            if end >= len(text):
+                break  # Unterminated string, cut before it
+            out.append(text[i:end + 1])
+            if stack and stack[-1][1] == "key":
+                stack[-1][1] = "colon"
+            else:
+                value_done()
+            i = end + 1
+        else:
+            match = _LITERAL.match(text, i)
+            token = match.group(0)
+            try:
+                json.loads(token)
+            except ValueError:
+                break  # A literal or number cut short
+            if match.end() >= len(text):
+                break  # It may continue past the end, e.g. "12" of "125"
+            out.append(token)
+            value_done()
+            i = match.end()
+
+    if safe is None:
+        return text
+    length, brackets = safe
+    return "".join(out[:length]) + "".join("}" if bracket == "{" else "]" for bracket in reversed(brackets))
+
+def _parse(kind: str, text: str, model: Type[BaseModel]) -> Tuple[dict, bool]:
+    """
+    Validate a completion against model, repairing it locally if needed.
+
+    :return: (the validated data as a dict, whether it needed repair)
+    """
+    repaired = False
+    try:
+        # strict=False accepts raw newlines inside strings, which models often emit
+        data = json.loads(text, strict=False)
+    except ValueError:
+        try:
+            data = json.loads(repair_json(text), strict=False)
+        except ValueError as e:
+            _stats[kind]["failed"] += 1
+            raise LLMOutputError(f"{kind} is not JSON, even after repair: {str(e)}")
+        repaired = True
+
+    try:
+        parsed = model.model_validate(data)
+    except ValidationError as e:
+        _stats[kind]["failed"] += 1
+        raise LLMOutputError(f"{kind} does not match the expected schema: {str(e)}")
+
+    # Fields the model didn't send were filled with their defaults
+    if isinstance(parsed, PodcastStructure) and len(parsed.model_fields_set) < len(PodcastStructure.model_fields):
+        repaired = True
+
+    _stats[kind]["repaired" if repaired else "parsed"] += 1
+    return parsed.model_dump(by_alias=True), repaired
+
+def parse_structure(text: str) -> Tuple[dict, bool]:
+    """The podcast structure as {"1": {"topic", "description"}, ..., "5": ...}, and whether it was repaired"""
+    return _parse("structure", text, PodcastStructure)
+
+def parse_transcript(text: str) -> Tuple[dict, bool]:
+    """The transcript as {"rounds": [{speaker: text}, ...]}, and whether it was repaired"""
+    return _parse("transcript", text, Transcript)
+
+def record_rerequest(kind: str) -> None:
+    _stats[kind]["rerequested"] += 1
+
+def parsing_stats() -> dict:
+    return {kind: dict(counter) for kind, counter in _stats.items()}
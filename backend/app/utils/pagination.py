@@ -0,0 +1,51 @@
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import Request, Response
+from pymongo import DESCENDING
+
+from config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+class InvalidCursor(ValueError):
+    """A page cursor that is not the _id of a document"""
+
+def page_size(limit: Optional[int]) -> int:
+    if limit is None:
+        return PAGE_SIZE_DEFAULT
+    return max(1, min(limit, PAGE_SIZE_MAX))
+
+async def fetch_page(
+    collection,
+    query: dict,
+    projection: Optional[dict],
+    cursor: Optional[str],
+    limit: int
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of query, newest first, keyed on _id.
+
+    The cursor is the _id of the last document of the previous page, so each
+    page is an index range scan from that point no matter how deep it is,
+    instead of skipping over every earlier document.
+
+    :return: (documents, cursor of the next page or None on the last page)
+    """
+    if cursor:
+        try:
+            query = {**query, "_id": {"$lt": ObjectId(cursor)}}
+        except (InvalidId, TypeError):
+            raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+    # One extra document tells whether there is a next page without counting
+    documents = await collection.find(query, projection).sort("_id", DESCENDING).limit(limit + 1).to_list()
+    if len(documents) > limit:
+        documents = documents[:limit]
+        return documents, str(documents[-1]["_id"])
+    return documents, None
+
+def set_next_page_headers(response: Response, request: Request, next_cursor: Optional[str]) -> None:
+    """Advertise the next page for endpoints whose body is a bare list or mapping"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
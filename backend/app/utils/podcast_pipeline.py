@@ -0,0 +1,387 @@
+import asyncio
+import os
+import time
+
+from repositories import podcast_repo, series_repo
+from utils.credit_operations import refund_podcast_credits
+from utils.job_queue import fail_waiting_episodes
+from config import KEEP_WAV_MASTER, LLM_MAX_ATTEMPTS, LLM_STREAMING
+from utils.groq_utils import cache_completion, cached_completion, generate_chat_completion, stream_chat_completion
+from utils.json_stream import RoundStreamParser
+from utils.llm_parsing import LLMOutputError, parse_structure, parse_transcript, record_rerequest
+from models.podcast import Transcript
+from utils.prompts import STRUCTURE_PROMPT, TRANSCRIPTION_PROMPT
+from utils.elevenlabs_utils import DEFAULT_HOST_VOICE, DEFAULT_GUEST_VOICE
+from utils.tts_workers import clip_filename, discard_synthesis, start_synthesis
+from utils.replicate_utils import generate_cover_art, resize_image
+from utils.audio_assembly import WavAssembler, compiled_audio_path, partial_audio_path
+from utils.stage_graph import StageError, StageGraph
+from utils.subtitles import cues_to_webvtt, write_webvtt
+from utils.transcoding import RENDITIONS, transcode_renditions
+
+async def generate_cover_art_stage(podcast: dict) -> dict:
+    podcast_id = str(podcast["_id"])
+    cover_art_prompt = f"Podcast cover art for topic: {podcast['prompt']}"
+    os.makedirs("cover_arts", exist_ok=True)
+    original_cover_path = f"cover_arts/{podcast_id}_original.png"
+    resized_cover_path = f"cover_arts/{podcast_id}_cover.png"
+
+    cover_art_path = await generate_cover_art(cover_art_prompt, original_cover_path)
+    if not cover_art_path:
+        raise Exception("Failed to generate cover art")
+
+    resized_cover_path = await asyncio.to_thread(resize_image, cover_art_path, resized_cover_path, (300, 300))
+    return {"cover_art_path": resized_cover_path}
+
+async def generate_structure_stage(podcast: dict) -> dict:
+    content, language = podcast["prompt"], podcast.get("language", "en")
+
+    # Prepare the messages for Groq (podcast structure)
+    structure_messages = [
+        {"role": "system", "content": STRUCTURE_PROMPT.format(LANGUAGE=language, TEMA=content)},
+        {"role": "user", "content": content}
+    ]
+
+    use_cache = podcast.get("use_llm_cache", True)
+
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            # Call Groq API for podcast structure, retries always ask for a fresh completion
+            cached = await cached_completion(structure_messages) if use_cache and attempt == 0 else None
+            structure_response = cached if cached is not None else await generate_chat_completion(structure_messages)
+
+            # store the response in a .txt log file
+            with open("openai_log.txt", "a") as log_file:
+                log_file.write(f"Structure response: {structure_response}\n")
+
+            # Near-valid output is repaired locally, only unusable output costs another completion
+            podcast_structure, repaired = parse_structure(structure_response)
+            # A hit is stored already, putting it again would only cost a write
+            if use_cache and cached is None:
+                await cache_completion(structure_messages, structure_response)
+            return {
+                "podcast_structure": podcast_structure,
+                "structure_parsing": {"repaired": repaired, "attempts": attempt + 1}
+            }
+
+        except Exception as e:
+            if attempt == LLM_MAX_ATTEMPTS - 1:  # If this was the last attempt
+                raise Exception(f"Failed to generate podcast structure after {LLM_MAX_ATTEMPTS} attempts. Last error: {str(e)}")
+            if isinstance(e, LLMOutputError):
+                record_rerequest("structure")
+
+def _round_utterances(round_index: int, round: dict) -> list:
+    utterances = []
+    for speaker, text in round.items():
+        # Use default voices regardless of language
+        voice = DEFAULT_HOST_VOICE if speaker == "speaker0" else DEFAULT_GUEST_VOICE
+        utterances.append({
+            "round": round_index,
+            "speaker": speaker,
+            "voice": voice,
+            "text": text
+        })
+    return utterances
+
+async def _stream_transcription(
+    transcription_messages: list,
+    podcast: dict,
+    speculative: dict
+) -> str:
+    """
+    Stream the transcript, starting TTS for each round as soon as it closes.
+    The audio stage later picks those clips up instead of synthesizing them again.
+
+    The clips are speculative until the full text validates: their tasks are
+    added to speculative, keyed by clip filename, for the caller to keep or discard.
+    """
+    parser = RoundStreamParser()
+    chunks = []
+    round_index = 0
+    podcast_id = str(podcast["_id"])
+
+    async for chunk in stream_chat_completion(transcription_messages):
+        chunks.append(chunk)
+        for round in parser.feed(chunk):
+            # Cleaned like the validated transcript will be, so the clips match it
+            round = (Transcript.drop_empty_turns([round]) or [None])[0]
+            if not round:
+                continue
+            for utterance in _round_utterances(round_index, round):
+                speculative[clip_filename(utterance, podcast_id)] = start_synthesis(
+                    utterance, podcast.get("language", "en"), podcast_id
+                )
+            round_index += 1
+
+    return "".join(chunks)
+
+async def share_with_series_stage(podcast: dict) -> dict:
+    """
+    Hand the first episode's structure and cover art to the rest of its series
+    and release them to the queue with those stages already done. Episodes
+    the structure left without a topic are failed, so their credits are refunded.
+    Does nothing for standalone podcasts and later episodes.
+    """
+    if not podcast.get("series_id") or podcast.get("episode", 1) != 1:
+        return {}
+
+    structure = podcast["podcast_structure"]
+    await series_repo.update(
+        podcast["series_id"],
+        {"$set": {"status": "generating", "podcast_structure": structure, "cover_art_path": podcast["cover_art_path"]}}
+    )
+
+    for episode in await podcast_repo.find_series_episodes(podcast["series_id"], {"episode": 1, "status": 1}):
+        # Only episodes still waiting, so a resumed first episode doesn't release them twice
+        if episode["episode"] == 1 or episode["status"] != "waiting":
+            continue
+        if not structure[str(episode["episode"])]["topic"].strip():
+            await podcast_repo.update(
+                episode["_id"],
+                {"$set": {"status": "error", "error_message": "The series structure has no topic for this episode"}}
+            )
+            await refund_podcast_credits(episode["_id"])
+            continue
+        await podcast_repo.update(
+            episode["_id"],
+            {
+                "$set": {
+                    "status": "pending",
+                    "podcast_structure": structure,
+                    "cover_art_path": podcast["cover_art_path"],
+                    "completed_stages": ["cover_art", "structure"]
+                }
+            }
+        )
+    return {}
+
+async def generate_transcription_stage(podcast: dict) -> dict:
+    # Standalone podcasts use the first topic, series episodes their own
+    first_topic = podcast["podcast_structure"][str(podcast.get("episode", 1))]["topic"]
+
+    # Prepare the messages for Groq (transcription)
+    transcription_messages = [
+        {"role": "system", "content": TRANSCRIPTION_PROMPT.format(first_topic=first_topic, LANGUAGE=podcast.get("language", "en"))},
+        {"role": "user", "content": first_topic}
+    ]
+
+    use_cache = podcast.get("use_llm_cache", True)
+
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        speculative = {}
+        try:
+            # Call Groq API for transcription, retries always ask for a fresh completion.
+            # A cached transcript is all there at once, the audio stage synthesizes it
+            cached = await cached_completion(transcription_messages) if use_cache and attempt == 0 else None
+            if cached is not None:
+                transcription_response = cached
+            elif LLM_STREAMING:
+                transcription_response = await _stream_transcription(transcription_messages, podcast, speculative)
+            else:
+                transcription_response = await generate_chat_completion(transcription_messages)
+
+            # The full text is validated again, streamed rounds were only a head start for TTS
+            transcription, repaired = parse_transcript(transcription_response)
+        except LLMOutputError as e:
+            for task in speculative.values():
+                discard_synthesis(task)
+            if attempt == LLM_MAX_ATTEMPTS - 1:
+                raise Exception(f"Failed to generate transcription after {LLM_MAX_ATTEMPTS} attempts. Last error: {str(e)}")
+            record_rerequest("transcript")
+            continue
+        except BaseException:
+            for task in speculative.values():
+                discard_synthesis(task)
+            raise
+
+        # Keep only the clips of lines the validated transcript still has
+        podcast_id = str(podcast["_id"])
+        used = {
+            clip_filename(utterance, podcast_id)
+            for i, round in enumerate(transcription["rounds"])
+            for utterance in _round_utterances(i, round)
+        }
+        for filename, task in speculative.items():
+            if filename not in used:
+                discard_synthesis(task)
+
+        if use_cache and cached is None:
+            await cache_completion(transcription_messages, transcription_response)
+        return {
+            "transcription": transcription,
+            "transcription_parsing": {"repaired": repaired, "attempts": attempt + 1}
+        }
+
+async def generate_audio_stage(podcast: dict) -> dict:
+    """
+    Synthesize every utterance and append the clips to a growing WAV in order.
+
+    After each clip the file is a valid WAV up to that clip's boundary, which is
+    published in podcast.progress together with the subtitle cues so far, so
+    listeners can start before the episode is finished.
+    """
+    podcast_id = str(podcast["_id"])
+    language = podcast.get("language", "en")
+
+    # Generate audio for each speaker's text
+    utterances = []
+    for i, round in enumerate(podcast["transcription"]["rounds"]):
+        utterances.extend(_round_utterances(i, round))
+
+    # Clips already started while streaming, or left on disk by a previous run, are reused
+    tasks = [start_synthesis(utterance, language, podcast_id) for utterance in utterances]
+
+    os.makedirs("compiled_audios", exist_ok=True)
+    partial_path = partial_audio_path(podcast_id)
+    await podcast_repo.update(podcast["_id"], {"$set": {"progress": {"audio_path": partial_path, "cues": []}}})
+
+    audio_files, cues = [], []
+    try:
+        with WavAssembler(partial_path) as assembler:
+            for task in tasks:
+                audio_file = await task
+                start, end = await asyncio.to_thread(assembler.append, audio_file["filepath"])
+
+                cue = {
+                    "start": start.total_seconds(),
+                    "end": end.total_seconds(),
+                    "speaker": audio_file["speaker"],
+                    "text": audio_file["text"]
+                }
+                audio_files.append(audio_file)
+                cues.append(cue)
+
+                await podcast_repo.update(
+                    podcast["_id"],
+                    {
+                        "$set": {
+                            "progress.format": list(assembler.params),
+                            "progress.data_offset": assembler.data_offset,
+                            "progress.published_bytes": assembler.data_bytes,
+                            "progress.duration": cue["end"]
+                        },
+                        "$push": {"progress.cues": cue}
+                    }
+                )
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return {"audio_files": audio_files, "cues": cues}
+
+async def assemble_audio_stage(podcast: dict) -> dict:
+    podcast_id = str(podcast["_id"])
+
+    # The audio stage already streamed every clip into the partial file
+    compiled_path = compiled_audio_path(podcast_id)
+    partial_path = partial_audio_path(podcast_id)
+    if os.path.exists(partial_path):
+        os.replace(partial_path, compiled_path)
+
+    subtitle_path = await asyncio.to_thread(
+        write_webvtt, cues_to_webvtt(podcast["cues"]), f"subtitles/{podcast_id}_subtitles.vtt"
+    )
+
+    # Clean up individual audio files
+    for audio_file in podcast["audio_files"]:
+        if os.path.exists(audio_file['filepath']):
+            os.remove(audio_file['filepath'])
+
+    return {"compiled_audio_path": compiled_path, "subtitle_path": subtitle_path}
+
+async def transcode_audio_stage(podcast: dict) -> dict:
+    """
+    Encode the compiled WAV into the compressed renditions. Runs after the
+    podcast is already playable, so it never fails: a missing rendition only
+    means the WAV (or another rendition) is served instead.
+    """
+    wav_path = podcast["compiled_audio_path"]
+    try:
+        renditions = await transcode_renditions(wav_path, str(podcast["_id"]))
+    except Exception as e:
+        print(f"Error transcoding {podcast['_id']}, serving the WAV: {str(e)}")
+        return {"renditions": podcast.get("renditions") or {}}
+
+    updates = {"renditions": renditions}
+    if renditions and len(renditions) == len(RENDITIONS) and not KEEP_WAV_MASTER:
+        os.remove(wav_path)
+        updates["compiled_audio_path"] = None
+    return updates
+
+# stage name -> (stage function, status shown while it runs)
+# Cover art is off the critical path, so it runs alongside the LLM stages without touching the status
+STAGES = {
+    "cover_art": (generate_cover_art_stage, None),
+    "structure": (generate_structure_stage, "generating_structure"),
+    "series": (share_with_series_stage, None),
+    "transcription": (generate_transcription_stage, "generating_transcription"),
+    "audio": (generate_audio_stage, "generating_audio"),
+    "assembly": (assemble_audio_stage, "assembling_audio"),
+    "transcode": (transcode_audio_stage, None),
+}
+
+PIPELINE = (
+    StageGraph()
+    .add("cover_art")
+    .add("structure")
+    .add("series", depends_on=["cover_art", "structure"])
+    .add("transcription", depends_on=["structure"])
+    .add("audio", depends_on=["transcription"])
+    .add("assembly", depends_on=["audio"])
+    .add("transcode", depends_on=["assembly"])
+)
+
+# Once these are done the podcast is playable; later stages run with status ready
+READY_STAGES = {"cover_art", "structure", "transcription", "audio", "assembly"}
+
+async def generate_podcast_task(podcast_id: str):
+    """
+    Run the generation pipeline for a podcast, skipping stages a previous run
+    already completed. Independent stages run concurrently and each stage's
+    output is persisted as soon as it finishes.
+    """
+    podcast = await podcast_repo.find_by_id(podcast_id)
+    completed_stages = set(podcast.get("completed_stages", []))
+
+    async def run_stage(stage: str):
+        stage_function, status = STAGES[stage]
+        if status:
+            await podcast_repo.update(podcast["_id"], {"$set": {"status": status}})
+
+        started = time.perf_counter()
+        updates = await stage_function(podcast)
+        elapsed = time.perf_counter() - started
+
+        completed_stages.add(stage)
+        if READY_STAGES <= completed_stages:
+            # Ready isn't an active status: the flag keeps the job reclaimable until transcoding is done
+            updates = {**updates, "status": "ready", "transcode_pending": "transcode" not in completed_stages}
+
+        await podcast_repo.update(
+            podcast["_id"],
+            {"$set": {**updates, f"stage_timings.{stage}": elapsed}, "$addToSet": {"completed_stages": stage}}
+        )
+        podcast.update(updates)
+
+    try:
+        await PIPELINE.run(run_stage, completed=set(completed_stages))
+    except StageError as e:
+        # Keep the outputs of completed stages so the podcast can be resumed
+        await podcast_repo.update(
+            podcast["_id"],
+            {"$set": {"status": "error", "failed_stage": e.stage, "error_message": str(e)}}
+        )
+        await refund_podcast_credits(podcast["_id"])
+        if podcast.get("series_id") and "series" not in completed_stages:
+            # The rest of the series was waiting on this episode, the worker refunds them
+            await fail_waiting_episodes(podcast["series_id"])
+        return
+
+    await podcast_repo.update(
+        podcast["_id"],
+        {
+            "$set": {"status": "ready"},
+            "$unset": {"failed_stage": "", "error_message": "", "progress": "", "transcode_pending": ""}
+        }
+    )
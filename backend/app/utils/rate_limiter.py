@@ -0,0 +1,223 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from config import (
+    COQUI_MAX_CONCURRENCY, HTTP_MAX_RETRY_AFTER, LIMITER_LATENCY_TOLERANCE, OPENAI_MAX_CONCURRENCY, OPENAI_REQUESTS_PER_MINUTE,
+    OPENAI_TOKENS_PER_MINUTE, REPLICATE_MAX_CONCURRENCY, REPLICATE_REQUESTS_PER_MINUTE, TTS_BACKENDS
+)
+
+# Responses that mean the provider is overloaded: rate limited, out of memory, or timing out
+CONGESTION_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Allow rate units per second on average, with bursts up to capacity.
+    Callers that find the bucket empty wait their turn instead of failing.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> None:
+        # A request larger than the whole bucket waits for a full bucket rather than forever
+        amount = min(amount, self.capacity)
+        # The lock makes waiters take tokens in arrival order
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or take (negative) tokens once the real cost is known, may go into debt"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class AdaptiveConcurrency:
+    """
+    A concurrency limit that follows what the provider can take (AIMD).
+
+    Each success with normal latency raises the limit by about one per window
+    of requests. A congestion signal halves it, and latency drifting above
+    latency_tolerance times the best seen lowers it by 10% (unless
+    latency_tolerance is None). Only requests
+    started after the last decrease can trigger another one, so one burst of
+    failures counts as a single signal.
+    """
+
+    def __init__(self, max_limit: float, min_limit: float = 1, latency_tolerance: Optional[float] = LIMITER_LATENCY_TOLERANCE):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        # Latency per unit of work (token, character...), smoothed and the best seen
+        self.latency = None
+        self.baseline = None
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _decrease(self, factor: float, started: float) -> bool:
+        if started < self.last_decrease:
+            return False
+        self.limit = max(self.min_limit, self.limit * factor)
+        self.last_decrease = time.monotonic()
+        return True
+
+    def on_success(self, latency: float, cost: float, started: float) -> None:
+        per_unit = latency / max(cost, 1)
+        self.latency = per_unit if self.latency is None else 0.8 * self.latency + 0.2 * per_unit
+        # The baseline creeps up so one unusually fast request doesn't anchor it forever
+        self.baseline = per_unit if self.baseline is None else min(per_unit, self.baseline * 1.01)
+
+        if self.latency_tolerance and self.latency > self.latency_tolerance * self.baseline:
+            self._decrease(0.9, started)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_congestion(self, started: float) -> bool:
+        return self._decrease(0.5, started)
+
+class Slot:
+    """One admitted request, told the response so the limiter can adapt"""
+
+    def __init__(self, cost: float):
+        self.cost = cost
+        self.started = time.monotonic()
+        self.response: Optional[httpx.Response] = None
+        self.error: Optional[Exception] = None
+
+    def observe(self, response: httpx.Response) -> None:
+        self.response = response
+
+    def fail(self, error: Exception) -> None:
+        """Record a transport error the caller handles itself"""
+        self.error = error
+
+class ProviderLimiter:
+    """
+    Meters the calls to one provider: a request budget and a token budget
+    (token buckets, per minute) and an adaptive concurrency limit. Requests
+    over any of them queue until they fit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        latency_tolerance: Optional[float] = LIMITER_LATENCY_TOLERANCE
+    ):
+        self.name = name
+        # 0 leaves a budget unmetered
+        self.requests = TokenBucket(requests_per_minute / 60, max(1, requests_per_minute / 6)) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency, latency_tolerance=latency_tolerance)
+        self.paused_until = 0.0
+        self.counts = {"requests": 0, "congested": 0, "queued_seconds": 0.0}
+
+    def pause(self, seconds: float) -> None:
+        """Hold every new request for a while, e.g. for a 429's Retry-After"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def settle_tokens(self, estimated: float, actual: float) -> None:
+        """Correct the token budget once a response reports what it really used"""
+        if self.tokens and actual:
+            self.tokens.adjust(estimated - actual)
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1, tokens: float = 0) -> AsyncIterator[Slot]:
+        """
+        Wait until the request fits the budgets and the concurrency limit, then
+        run it. cost is the request's size in any unit the provider's latency
+        scales with, so long and short requests are compared fairly.
+        """
+        queued = time.monotonic()
+        while time.monotonic() < self.paused_until:
+            await asyncio.sleep(self.paused_until - time.monotonic())
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens and tokens:
+            await self.tokens.acquire(tokens)
+        await self.concurrency.acquire()
+
+        slot = Slot(cost)
+        self.counts["requests"] += 1
+        self.counts["queued_seconds"] += slot.started - queued
+        try:
+            yield slot
+        except httpx.TimeoutException:
+            self._congested(slot)
+            raise
+        else:
+            status = slot.response.status_code if slot.response is not None else None
+            if status in CONGESTION_STATUS_CODES or isinstance(slot.error, httpx.TimeoutException):
+                self._congested(slot)
+            elif status is not None and status < 400:
+                self.concurrency.on_success(time.monotonic() - slot.started, slot.cost, slot.started)
+        finally:
+            await self.concurrency.release()
+
+    def _congested(self, slot: Slot) -> None:
+        self.counts["congested"] += 1
+        previous = self.concurrency.limit
+        if self.concurrency.on_congestion(slot.started):
+            print(f"{self.name} is congested, concurrency limit {previous:.1f} -> {self.concurrency.limit:.1f}")
+
+        retry_after = slot.response.headers.get("retry-after") if slot.response is not None else None
+        if retry_after and retry_after.isdigit():
+            self.pause(min(float(retry_after), HTTP_MAX_RETRY_AFTER))
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": round(self.concurrency.limit, 1),
+            "in_flight": self.concurrency.in_flight,
+            **self.counts
+        }
+
+_limiters: Dict[str, ProviderLimiter] = {}
+
+def get_limiter(name: str) -> ProviderLimiter:
+    """The limiter of a provider: "openai", "replicate", or a TTS backend's URL"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        if name == "openai":
+            # Completion time follows the output length, unknown up front, so only errors drive it
+            limiter = ProviderLimiter(
+                name, OPENAI_MAX_CONCURRENCY, OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE, latency_tolerance=None
+            )
+        elif name == "replicate":
+            limiter = ProviderLimiter(name, REPLICATE_MAX_CONCURRENCY, REPLICATE_REQUESTS_PER_MINUTE)
+        else:
+            # A TTS backend never runs more than its configured concurrency, less while it struggles
+            limiter = ProviderLimiter(f"tts {name}", TTS_BACKENDS.get(name, COQUI_MAX_CONCURRENCY))
+        _limiters[name] = limiter
+    return limiter
+
+def limiter_stats() -> Dict[str, dict]:
+    return {limiter.name: limiter.stats() for limiter in _limiters.values()}
@@ -1,8 +1,12 @@
+import asyncio
 import os
-import replicate
-import requests
+import time
 from io import BytesIO
+import httpx
 from PIL import Image
+from config import REPLICATE_PREDICTION_TIMEOUT
+from utils.http_client import request
+from utils.rate_limiter import get_limiter
 
 # Ensure the REPLICATE_API_TOKEN is set in the environment
 REPLICATE_API_TOKEN = os.getenv("REPLICATE_API_TOKEN")
@@ -10,10 +14,51 @@ REPLICATE_API_TOKEN = os.getenv("REPLICATE_API_TOKEN")
 if not REPLICATE_API_TOKEN:
     raise ValueError("REPLICATE_API_TOKEN is not set in the environment")
 
-# Configure the Replicate client
-replicate.Client(api_token=REPLICATE_API_TOKEN)
+REPLICATE_API_URL = os.getenv("REPLICATE_API_URL", "https://api.replicate.com/v1")
+STABLE_DIFFUSION_VERSION = "db21e45d3f7023abc2a46ee38a23973f6dce16bb082a930b0c49861f96d1e5bf"
+POLL_INTERVAL = 1.0
 
-def generate_cover_art(prompt: str, output_path: str) -> str:
+async def _run_prediction(version: str, input: dict) -> list:
+    headers = {
+        "Authorization": f"Bearer {REPLICATE_API_TOKEN}",
+        "Content-Type": "application/json",
+        # Hold the connection until the prediction finishes (up to 60s) instead of polling right away
+        "Prefer": "wait"
+    }
+
+    limiter = get_limiter("replicate")
+    response = await request(
+        "POST", f"{REPLICATE_API_URL}/predictions", limiter=limiter, headers=headers, json={"version": version, "input": input}
+    )
+    if response.status_code not in (200, 201):
+        raise Exception(f"Error calling Replicate API: {response.status_code} - {response.text}")
+    prediction = response.json()
+
+    deadline = time.monotonic() + REPLICATE_PREDICTION_TIMEOUT
+    while prediction["status"] not in ("succeeded", "failed", "canceled"):
+        if time.monotonic() >= deadline:
+            # Stop paying for a prediction nobody will wait for, the timeout is reported either way
+            try:
+                await request("POST", prediction["urls"]["cancel"], limiter=limiter, headers=headers)
+            except httpx.HTTPError as e:
+                print(f"Error canceling Replicate prediction: {str(e)}")
+            raise Exception(f"Replicate prediction timed out after {REPLICATE_PREDICTION_TIMEOUT:.0f}s")
+        await asyncio.sleep(POLL_INTERVAL)
+        response = await request("GET", prediction["urls"]["get"], limiter=limiter, headers=headers)
+        if response.status_code != 200:
+            raise Exception(f"Error polling Replicate prediction: {response.status_code} - {response.text}")
+        prediction = response.json()
+
+    if prediction["status"] != "succeeded":
+        raise Exception(f"Replicate prediction {prediction['status']}: {prediction.get('error')}")
+
+    return prediction["output"]
+
+def _save_image(content: bytes, output_path: str) -> None:
+    img = Image.open(BytesIO(content))
+    img.save(output_path)
+
+async def generate_cover_art(prompt: str, output_path: str) -> str:
     """
     Generate cover art using Replicate's Stable Diffusion model.
 
@@ -23,22 +68,18 @@ def generate_cover_art(prompt: str, output_path: str) -> str:
     """
     try:
         # Use Stable Diffusion model to generate image
-        output = replicate.run(
-            "stability-ai/stable-diffusion:db21e45d3f7023abc2a46ee38a23973f6dce16bb082a930b0c49861f96d1e5bf",
-            input={"prompt": prompt}
-        )
+        output = await _run_prediction(STABLE_DIFFUSION_VERSION, {"prompt": prompt})
 
         # The output is a list with one item: the URL of the generated image
         image_url = output[0]
 
         # Download the image
-        response = requests.get(image_url)
+        response = await request("GET", image_url)
         if response.status_code != 200:
             raise Exception(f"Failed to download image: HTTP {response.status_code}")
 
         # Open the image and save it locally
-        img = Image.open(BytesIO(response.content))
-        img.save(output_path)
+        await asyncio.to_thread(_save_image, response.content, output_path)
 
         return output_path
 
@@ -62,4 +103,4 @@ def resize_image(input_path: str, output_path: str, size: tuple = (300, 300)) ->
         return output_path
     except Exception as e:
         print(f"Error resizing image: {str(e)}")
-        return None
\ No newline at end of file
+        return None
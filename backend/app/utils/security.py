@@ -1,20 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 
 import jwt
-from config import JWT_ALGORITHM, JWT_SECRET
+from config import BCRYPT_ROUNDS, JWT_ALGORITHM, JWT_SECRET, PASSWORD_HASH_WORKERS
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from models.user import UserResponse
+from repositories import user_repo
 from passlib.context import CryptContext
+from utils.user_cache import user_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with any other cost are flagged for an upgrade on the next login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
 security = HTTPBearer()
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt releases the GIL while hashing, so threads run it in parallel off the event loop
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password) -> bool:
+    valid, _ = await verify_and_update_password(plain_password, hashed_password)
+    return valid
+
+async def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password and, if its hash uses an outdated cost, rehash it.
+
+    :return: (whether the password matches, new hash to store or None)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash(password) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=24)):
     to_encode = data.copy()
@@ -37,6 +63,16 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     payload = decode_token(token)
     return payload.get("sub")
 
+async def get_current_user_doc(current_user: str = Depends(get_current_user)) -> dict:
+    """Resolve the authenticated user's document, served from a short-TTL cache when possible"""
+    user = user_cache.get(current_user)
+    if user is None:
+        user = await user_repo.find_by_email(current_user)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.set(user)
+    return user
+
 def create_user_response(user: dict) -> dict:
     user_response = UserResponse(
         email=user["email"],
@@ -0,0 +1,61 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List
+
+class StageError(Exception):
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(str(error))
+        self.stage = stage
+        self.error = error
+
+class StageGraph:
+    """
+    A small DAG of pipeline stages.
+
+    Each stage starts as soon as all of its dependencies have completed, so
+    independent stages run concurrently and total time follows the critical path.
+    Dependencies must be added before the stages that need them, which rules out cycles.
+    """
+
+    def __init__(self):
+        self.dependencies: Dict[str, List[str]] = {}
+
+    def add(self, name: str, depends_on: Iterable[str] = ()) -> "StageGraph":
+        depends_on = list(depends_on)
+        for dependency in depends_on:
+            if dependency not in self.dependencies:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+        self.dependencies[name] = depends_on
+        return self
+
+    async def run(self, run_stage: Callable[[str], Awaitable[None]], completed: Iterable[str] = ()) -> None:
+        """
+        Run every stage not in completed through run_stage.
+
+        The first failing stage cancels the ones still running and is raised as a
+        StageError; stages that finished before that are left as they are.
+        """
+        finished = {name: asyncio.Event() for name in self.dependencies}
+        for name in completed:
+            if name in finished:
+                finished[name].set()
+
+        async def run_one(name: str):
+            for dependency in self.dependencies[name]:
+                await finished[dependency].wait()
+            try:
+                await run_stage(name)
+            except Exception as e:
+                raise StageError(name, e) from e
+            finished[name].set()
+
+        tasks = [
+            asyncio.create_task(run_one(name))
+            for name, event in finished.items() if not event.is_set()
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
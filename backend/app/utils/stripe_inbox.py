@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from config import CREDIT_VALUE, STRIPE_APPLY_BATCH_SIZE, STRIPE_APPLY_INTERVAL
+from repositories import payment_repo, user_repo
+from utils.user_cache import user_cache
+
+# Event types that are stored and applied, every other type is acknowledged and dropped
+HANDLED_EVENTS = {"checkout.session.completed"}
+
+_wakeup: Optional[asyncio.Event] = None
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+async def record_event(event: dict) -> bool:
+    """
+    Store a verified webhook event, as a plain dict (StripeObject.to_dict()),
+    for the applier. Its id is the document _id, so a redelivered event is
+    rejected by the database.
+
+    :return: False if the event is a duplicate or of a type that isn't handled
+    """
+    if event["type"] not in HANDLED_EVENTS:
+        return False
+
+    session = event["data"]["object"]
+    recorded = await payment_repo.record_event({
+        "_id": event["id"],
+        "type": event["type"],
+        "session_id": session["id"],
+        "user_id": (session.get("metadata") or {}).get("user_id"),
+        "amount_total": session.get("amount_total"),
+        "status": "pending",
+        "received_at": datetime.utcnow()
+    })
+    if recorded:
+        _get_wakeup().set()
+    return recorded
+
+async def apply_pending_events(limit: int = STRIPE_APPLY_BATCH_SIZE) -> int:
+    """
+    Apply a batch of pending checkout events: store the payments, credit the
+    users, then mark the events processed, each step as one bulk write.
+
+    The payments collection, unique on payment_id, is the record of what was
+    credited: only payments not marked yet are credited. Users remember their
+    most recent payment ids for the window between credit and mark, so a
+    batch interrupted halfway, or applied by two processes at once, never
+    credits twice.
+
+    :return: number of events taken from the inbox
+    """
+    events = await payment_repo.pending_events(limit)
+    if not events:
+        return 0
+
+    payments, credits, invalid = [], [], []
+    for event in events:
+        try:
+            user_id = ObjectId(event["user_id"])
+            amount = event["amount_total"] / 100  # Convert cents to dollars
+        except (InvalidId, TypeError):
+            invalid.append(event["_id"])
+            continue
+
+        payments.append({
+            "user_id": user_id,
+            "payment_id": event["session_id"],
+            "status": "completed",
+            "amount": amount,
+            "description": "Credit purchase",
+            "payment_date": event["received_at"],
+            "credits_added": False
+        })
+        credits.append((user_id, event["session_id"], amount / CREDIT_VALUE))
+
+    if payments:
+        await payment_repo.upsert_many(payments)
+        # A payment redelivered after its first event expired from the inbox is already credited
+        uncredited = set(await payment_repo.uncredited([payment["payment_id"] for payment in payments]))
+        credits = [credit for credit in credits if credit[1] in uncredited]
+        if credits:
+            await user_repo.add_payment_credits(credits)
+            await payment_repo.mark_credits_added(list(uncredited))
+        for user_id, _, _ in credits:
+            user_cache.invalidate(user_id=user_id)
+
+    if invalid:
+        await payment_repo.mark_events(invalid, "failed", "Missing or invalid user_id metadata or amount")
+    await payment_repo.mark_events([event["_id"] for event in events if event["_id"] not in invalid], "processed")
+    return len(events)
+
+async def run_applier(stopping: asyncio.Event):
+    """
+    Drain the inbox until stopping is set. Wakes up as soon as this process
+    records an event, and every STRIPE_APPLY_INTERVAL seconds for events
+    recorded by other processes or left by a crash.
+    """
+    wakeup = _get_wakeup()
+    while not stopping.is_set():
+        wakeup.clear()
+        try:
+            # Keep going while full batches come back, a burst is drained back to back
+            while await apply_pending_events() == STRIPE_APPLY_BATCH_SIZE:
+                pass
+        except Exception as e:
+            print(f"Error applying Stripe events: {str(e)}")
+
+        stop = asyncio.ensure_future(stopping.wait())
+        woken = asyncio.ensure_future(wakeup.wait())
+        await asyncio.wait([stop, woken], timeout=STRIPE_APPLY_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        woken.cancel()
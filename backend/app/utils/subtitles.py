@@ -0,0 +1,57 @@
+import gzip
+import os
+import re
+from typing import Dict, List
+
+# A cue is {"start": seconds, "end": seconds, "speaker": str, "text": str}
+
+def _vtt_timestamp(seconds: float) -> str:
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+def _vtt_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def cues_to_webvtt(cues: List[Dict]) -> str:
+    """Render cues as WebVTT, with the speaker carried in a <v> voice tag"""
+    blocks = ["WEBVTT"]
+    for i, cue in enumerate(cues):
+        blocks.append(
+            f"{i + 1}\n"
+            f"{_vtt_timestamp(cue['start'])} --> {_vtt_timestamp(cue['end'])}\n"
+            f"<v {_vtt_escape(cue['speaker'])}>{_vtt_escape(cue['text'])}"
+        )
+    return "\n\n".join(blocks) + "\n"
+
+def srt_to_webvtt(srt_content: str) -> str:
+    """Convert subtitles written as SRT by older versions, dropping the "speaker: " prefixes"""
+    # Remove speaker prefix from each line
+    srt_content = re.sub(r'\n[^>]*?: ', '\n', srt_content)
+
+    # Convert SRT to WebVTT
+    return "WEBVTT\n\n" + re.sub(
+        r'(\d{2}):(\d{2}):(\d{2}),(\d{3})',
+        r'\1:\2:\3.\4',
+        srt_content
+    )
+
+def write_webvtt(content: str, subtitle_path: str) -> str:
+    """
+    Write a WebVTT file plus a gzipped copy next to it, so serving it is a
+    plain static file read either way.
+    """
+    os.makedirs(os.path.dirname(subtitle_path) or ".", exist_ok=True)
+    data = content.encode("utf-8")
+
+    with open(f"{subtitle_path}.tmp", "wb") as f:
+        f.write(data)
+    os.replace(f"{subtitle_path}.tmp", subtitle_path)
+
+    with open(f"{subtitle_path}.gz.tmp", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    os.replace(f"{subtitle_path}.gz.tmp", f"{subtitle_path}.gz")
+
+    return subtitle_path
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from config import AUDIO_RENDITIONS, TRANSCODE_MAX_WORKERS
+
+# format -> ffmpeg codec, container extension, default bitrate, media type
+FORMATS = {
+    "mp3": {"codec": "libmp3lame", "extension": "mp3", "bitrate": "96k", "media_type": "audio/mpeg"},
+    "opus": {"codec": "libopus", "extension": "opus", "bitrate": "48k", "media_type": "audio/ogg; codecs=opus"},
+    "aac": {"codec": "aac", "extension": "m4a", "bitrate": "64k", "media_type": "audio/mp4"},
+}
+WAV_MEDIA_TYPE = "audio/wav"
+
+# ffmpeg runs as its own process, this only caps how many run at once
+_slots: Optional[asyncio.Semaphore] = None
+
+def _parse_renditions(entries: List[str]) -> List[Tuple[str, str]]:
+    renditions = []
+    for entry in entries:
+        audio_format, _, bitrate = entry.partition(":")
+        if audio_format not in FORMATS:
+            raise ValueError(f"Unsupported audio rendition format in AUDIO_RENDITIONS: {audio_format}")
+        if bitrate and not re.fullmatch(r"\d+k?", bitrate):
+            raise ValueError(f"Invalid bitrate in AUDIO_RENDITIONS: {entry}")
+        if any(audio_format == existing for existing, _ in renditions):
+            # Renditions are stored by format, a second one would overwrite the first
+            raise ValueError(f"Audio rendition format listed twice in AUDIO_RENDITIONS: {audio_format}")
+        renditions.append((audio_format, bitrate or FORMATS[audio_format]["bitrate"]))
+    return renditions
+
+# (format, bitrate) pairs, parsed on import so a bad AUDIO_RENDITIONS stops the API and the worker from starting
+RENDITIONS = _parse_renditions(AUDIO_RENDITIONS)
+
+async def transcode(source_path: str, output_path: str, codec: str, bitrate: str) -> str:
+    """Encode source_path with an ffmpeg process, at most TRANSCODE_MAX_WORKERS at once"""
+    tmp_path = f"{output_path}.tmp"
+    command = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", source_path, "-vn", "-c:a", codec, "-b:a", bitrate,
+    ]
+    if output_path.endswith(".m4a"):
+        # Index up front so players can seek before the whole file has downloaded
+        command += ["-movflags", "+faststart", "-f", "mp4"]
+    elif output_path.endswith(".opus"):
+        command += ["-f", "ogg"]
+    else:
+        command += ["-f", os.path.splitext(output_path)[1][1:]]
+    command.append(tmp_path)
+
+    async with _get_slots():
+        # Cancelled while spawning, asyncio kills the process itself
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            await _kill(process)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    if process.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise Exception(f"ffmpeg failed ({process.returncode}): {stderr.decode(errors='replace').strip()}")
+
+    os.replace(tmp_path, output_path)
+    return output_path
+
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    try:
+        process.kill()
+    except ProcessLookupError:
+        # Already exited
+        pass
+    await process.wait()
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(TRANSCODE_MAX_WORKERS)
+    return _slots
+
+async def transcode_renditions(wav_path: str, podcast_id: str) -> Dict[str, Dict[str, str]]:
+    """
+    Produce every configured compressed rendition of a compiled episode in parallel.
+
+    :return: {format: {"path", "media_type", "bitrate"}} for the renditions that succeeded
+    """
+    os.makedirs("compiled_audios", exist_ok=True)
+
+    jobs = {}
+    for audio_format, bitrate in RENDITIONS:
+        spec = FORMATS[audio_format]
+        output_path = f"compiled_audios/{podcast_id}_{bitrate}.{spec['extension']}"
+        jobs[audio_format] = (
+            bitrate,
+            output_path,
+            asyncio.ensure_future(transcode(wav_path, output_path, spec["codec"], bitrate))
+        )
+
+    renditions = {}
+    try:
+        for audio_format, (bitrate, output_path, job) in jobs.items():
+            try:
+                await job
+            except Exception as e:
+                print(f"Error transcoding {podcast_id} to {audio_format}: {str(e) or type(e).__name__}")
+                continue
+            renditions[audio_format] = {
+                "path": output_path,
+                "media_type": FORMATS[audio_format]["media_type"],
+                "bitrate": bitrate
+            }
+    except BaseException:
+        # Cancelled: stop the other encodes too, killing their ffmpeg processes
+        for _, _, job in jobs.values():
+            job.cancel()
+        raise
+    return renditions
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = [piece.strip() for piece in part.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges.append((media_range.lower(), q))
+    return ranges
+
+def _quality(media_type: str, accept_ranges: List[Tuple[str, float]]) -> float:
+    """q-value the client gives media_type, using the most specific matching range"""
+    media_type = media_type.split(";")[0].strip()
+    main_type = media_type.split("/")[0]
+    best_specificity, best_q = -1, 0.0
+    for media_range, q in accept_ranges:
+        if media_range == media_type:
+            specificity = 2
+        elif media_range == f"{main_type}/*":
+            specificity = 1
+        elif media_range == "*/*":
+            specificity = 0
+        else:
+            continue
+        if specificity > best_specificity:
+            best_specificity, best_q = specificity, q
+    return best_q
+
+def choose_rendition(
+    accept: Optional[str],
+    renditions: Dict[str, Dict[str, str]],
+    wav_path: Optional[str],
+    requested_format: Optional[str] = None
+) -> Optional[Tuple[str, str]]:
+    """
+    Pick the (path, media type) to serve for an Accept header.
+
+    An explicit requested_format wins if it exists. Otherwise the candidate with
+    the highest q-value is chosen, ties going to the AUDIO_RENDITIONS order, with
+    the WAV master (if still on disk) last.
+    """
+    preference = [audio_format for audio_format, _ in RENDITIONS]
+    ordered = sorted(
+        renditions.items(),
+        key=lambda item: preference.index(item[0]) if item[0] in preference else len(preference)
+    )
+    candidates = [
+        (rendition["path"], rendition["media_type"], audio_format)
+        for audio_format, rendition in ordered
+        if os.path.exists(rendition["path"])
+    ]
+    if wav_path and os.path.exists(wav_path):
+        candidates.append((wav_path, WAV_MEDIA_TYPE, "wav"))
+    if not candidates:
+        return None
+
+    if requested_format:
+        for path, media_type, audio_format in candidates:
+            if audio_format == requested_format:
+                return path, media_type
+
+    if not accept:
+        return candidates[0][:2]
+
+    accept_ranges = _parse_accept(accept)
+    best = max(candidates, key=lambda candidate: _quality(candidate[1], accept_ranges))
+    if _quality(best[1], accept_ranges) <= 0:
+        # Nothing acceptable, fall back to the preferred rendition rather than a 406
+        return candidates[0][:2]
+    return best[:2]
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from config import (
+    TTS_BACKENDS, TTS_EJECT_AFTER_FAILURES, TTS_EJECT_SECONDS, TTS_HEALTH_CHECK_INTERVAL,
+    TTS_HEALTH_CHECK_PATH, TTS_HEALTH_CHECK_TIMEOUT
+)
+from utils.http_client import request
+from utils.rate_limiter import get_limiter
+
+class TTSNode:
+    """One TTS server, with what the pool knows about its load and health"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        # Seconds per character of text, smoothed
+        self.latency = None
+        self.stats = {"requests": 0, "failures": 0, "ejections": 0}
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    def load(self) -> float:
+        """
+        Outstanding requests relative to what the node's limiter currently lets
+        through. Recent failures weigh it down too, otherwise a node that fails
+        fast would always look idle and draw every request until it is ejected.
+        """
+        return (self.outstanding + 1) * (1 + self.consecutive_failures) / get_limiter(self.url).concurrency.limit
+
+class TTSPool:
+    """
+    Routes each synthesis to the healthy node with the fewest outstanding
+    requests for its capacity.
+
+    A node failing TTS_EJECT_AFTER_FAILURES requests in a row, or a health
+    probe, is ejected for TTS_EJECT_SECONDS. It comes back when a probe
+    passes, or when the time is up and it gets a request again. With every
+    node ejected, the one due back soonest is still tried, rather than
+    failing outright.
+
+    Every node is probed once before the first request of the process, so a
+    node already down is ejected before any synthesis is sent to it, in the
+    API and the benchmark as well as in the worker.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.nodes = [TTSNode(url) for url in urls]
+        self._probed = False
+        self._probing: Optional[asyncio.Lock] = None
+
+    async def _probe_once(self) -> None:
+        if self._probed:
+            return
+        if self._probing is None:
+            self._probing = asyncio.Lock()
+        async with self._probing:
+            if not self._probed:
+                await asyncio.gather(*(self.probe(node) for node in self.nodes))
+                self._probed = True
+
+    def choose(self) -> TTSNode:
+        healthy = [node for node in self.nodes if not node.ejected]
+        if not healthy:
+            return min(self.nodes, key=lambda node: node.ejected_until)
+        return min(healthy, key=TTSNode.load)
+
+    def _eject(self, node: TTSNode, reason: str) -> None:
+        if not node.ejected:
+            node.stats["ejections"] += 1
+            print(f"TTS node {node.url} ejected for {TTS_EJECT_SECONDS}s: {reason}")
+        node.ejected_until = time.monotonic() + TTS_EJECT_SECONDS
+
+    def _readmit(self, node: TTSNode) -> None:
+        if node.ejected_until:
+            print(f"TTS node {node.url} readmitted")
+        node.ejected_until = 0.0
+        node.consecutive_failures = 0
+
+    @asynccontextmanager
+    async def use(self, cost: float = 1) -> AsyncIterator[TTSNode]:
+        """Pick a node and count the request against it until it's done"""
+        await self._probe_once()
+        node = self.choose()
+        node.outstanding += 1
+        node.stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            yield node
+        except Exception as e:
+            node.stats["failures"] += 1
+            node.consecutive_failures += 1
+            if node.consecutive_failures >= TTS_EJECT_AFTER_FAILURES:
+                self._eject(node, f"{node.consecutive_failures} failed requests in a row, last: {str(e)}")
+            raise
+        else:
+            per_character = (time.monotonic() - started) / max(cost, 1)
+            node.latency = per_character if node.latency is None else 0.8 * node.latency + 0.2 * per_character
+            self._readmit(node)
+        finally:
+            node.outstanding -= 1
+
+    async def probe(self, node: TTSNode) -> bool:
+        try:
+            response = await request(
+                "GET", f"{node.url}{TTS_HEALTH_CHECK_PATH}", retries=0, timeout=TTS_HEALTH_CHECK_TIMEOUT
+            )
+            healthy = response.status_code < 500
+            reason = f"health check returned {response.status_code}"
+        except httpx.HTTPError as e:
+            healthy, reason = False, f"health check failed: {str(e) or type(e).__name__}"
+
+        if healthy:
+            self._readmit(node)
+        else:
+            self._eject(node, reason)
+        return healthy
+
+    async def run_health_checks(self, stopping: asyncio.Event):
+        """Probe every node each TTS_HEALTH_CHECK_INTERVAL seconds until stopping is set"""
+        while not stopping.is_set():
+            await asyncio.gather(*(self.probe(node) for node in self.nodes))
+            self._probed = True
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=TTS_HEALTH_CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            node.url: {
+                "healthy": not node.ejected,
+                "outstanding": node.outstanding,
+                "ms_per_character": round(node.latency * 1000, 2) if node.latency is not None else None,
+                **node.stats
+            }
+            for node in self.nodes
+        }
+
+tts_pool = TTSPool(list(TTS_BACKENDS))
@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import os
+from typing import Any, Dict
+
+from config import TTS_MAX_RETRIES, TTS_RETRY_BACKOFF
+from utils.elevenlabs_utils import generate_speech, save_audio
+
+# Synthesis tasks in flight, keyed by clip path, so an utterance is never synthesized twice at once
+_inflight: Dict[str, asyncio.Task] = {}
+
+def clip_filename(utterance: Dict[str, Any], podcast_id: str) -> str:
+    # The text hash keeps a clip from being reused if the line it was made for changes
+    text_hash = hashlib.sha1(utterance["text"].encode("utf-8")).hexdigest()[:8]
+    return f"{podcast_id}_{utterance['round']}_{utterance['speaker']}_{text_hash}.wav"
+
+async def _synthesize(utterance: Dict[str, Any], language: str, podcast_id: str) -> Dict[str, Any]:
+    filename = clip_filename(utterance, podcast_id)
+    audio_file = {
+        "round": utterance["round"],
+        "speaker": utterance["speaker"],
+        "filepath": f"audios/{filename}",
+        "text": utterance["text"]
+    }
+
+    # Checkpoint: a clip saved by an earlier, interrupted run is kept as is
+    if os.path.exists(audio_file["filepath"]) and os.path.getsize(audio_file["filepath"]) > 0:
+        return audio_file
+
+    for attempt in range(TTS_MAX_RETRIES):
+        try:
+            # Each attempt is routed to the least loaded healthy TTS server (see utils.tts_pool)
+            audio_content = await generate_speech(utterance["text"], utterance["voice"], language)
+            break
+        except Exception as e:
+            if attempt == TTS_MAX_RETRIES - 1:
+                raise Exception(
+                    f"TTS failed for round {utterance['round']} ({utterance['speaker']}) "
+                    f"after {TTS_MAX_RETRIES} attempts: {str(e)}"
+                )
+            await asyncio.sleep(TTS_RETRY_BACKOFF * 2 ** attempt)
+
+    save = asyncio.ensure_future(asyncio.to_thread(save_audio, audio_content, filename))
+    try:
+        audio_file["filepath"] = await asyncio.shield(save)
+    except asyncio.CancelledError:
+        # The write itself can't be interrupted, the clip is removed once it lands
+        save.add_done_callback(lambda _: _remove_clip(audio_file["filepath"]))
+        raise
+    return audio_file
+
+def _remove_clip(filepath: str) -> None:
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+def discard_synthesis(task: asyncio.Task) -> None:
+    """Stop synthesizing a clip nobody needs any more, deleting it if it was already saved"""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled() and task.exception() is None:
+        _remove_clip(task.result()["filepath"])
+
+def start_synthesis(utterance: Dict[str, Any], language: str, podcast_id: str) -> asyncio.Task:
+    """
+    Start synthesizing an utterance in the background, or return the task already doing it.
+    """
+    filepath = f"audios/{clip_filename(utterance, podcast_id)}"
+    task = _inflight.get(filepath)
+    if task is None:
+        task = asyncio.ensure_future(_synthesize(utterance, language, podcast_id))
+        _inflight[filepath] = task
+
+        def _done(finished: asyncio.Task):
+            _inflight.pop(filepath, None)
+            # Mark failures of tasks nobody ended up awaiting as retrieved
+            if not finished.cancelled():
+                finished.exception()
+
+        task.add_done_callback(_done)
+    return task
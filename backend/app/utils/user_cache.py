@@ -0,0 +1,51 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL
+
+class UserCache:
+    """
+    Short-lived in-process cache of user documents keyed by email.
+
+    Writers that change a user (credits, password, reset tokens) must call
+    invalidate so the next request reads the fresh document. Other API
+    processes keep their copy until the TTL runs out.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[email]
+                return None
+            self._entries.move_to_end(email)
+            return dict(user)
+
+    def set(self, user: dict) -> None:
+        with self._lock:
+            self._entries[user["email"]] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(user["email"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: Optional[str] = None, user_id=None) -> None:
+        with self._lock:
+            if email is not None:
+                self._entries.pop(email, None)
+            if user_id is not None:
+                for key, (_, user) in list(self._entries.items()):
+                    if str(user["_id"]) == str(user_id):
+                        del self._entries[key]
+
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_MAX_ENTRIES)
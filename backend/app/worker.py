@@ -0,0 +1,125 @@
+import asyncio
+import os
+import signal
+import socket
+import time
+import uuid
+
+from config import JOB_LEASE_SECONDS, WORKER_CONCURRENCY, WORKER_POLL_INTERVAL
+from database import close_db, get_db, init_db
+from utils.db_indexes import ensure_indexes
+from utils.credit_operations import refund_failed_podcasts
+from utils.http_client import close_clients
+from utils.job_queue import (
+    claim_podcast_job, fail_exhausted_jobs, fail_waiting_episodes, release_podcast_job, renew_lease
+)
+from utils.podcast_pipeline import generate_podcast_task
+from utils.tts_cache import tts_cache
+from utils.tts_pool import tts_pool
+
+# Wait between attempts when a lease renewal fails
+HEARTBEAT_RETRY_SECONDS = 2
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+async def heartbeat(podcast_id: str, job: asyncio.Task):
+    """
+    Keep the lease alive while the job runs. Failed renewals (a database
+    timeout, a failover) are retried, but the job is cancelled if the lease is
+    lost, or can't be confirmed before it runs out: from then on another
+    worker may claim the podcast and run it too.
+    """
+    # Set when the job was claimed, just before this started
+    expires = time.monotonic() + JOB_LEASE_SECONDS
+    delay = JOB_LEASE_SECONDS / 3
+    while not job.done():
+        await asyncio.sleep(delay)
+        attempted = time.monotonic()
+        try:
+            renewed = await asyncio.wait_for(renew_lease(podcast_id, WORKER_ID), timeout=max(expires - attempted, 0))
+        except Exception as e:
+            delay = min(HEARTBEAT_RETRY_SECONDS, JOB_LEASE_SECONDS / 3)
+            if time.monotonic() + delay < expires:
+                print(f"Error renewing lease on podcast {podcast_id}, retrying: {str(e) or type(e).__name__}")
+                continue
+            print(f"Could not renew lease on podcast {podcast_id} before it expired, cancelling")
+            job.cancel()
+            return
+
+        if not renewed:
+            print(f"Lost lease on podcast {podcast_id}, cancelling")
+            job.cancel()
+            return
+        expires = attempted + JOB_LEASE_SECONDS
+        delay = JOB_LEASE_SECONDS / 3
+
+async def run_job(podcast: dict):
+    podcast_id = str(podcast["_id"])
+    print(f"Worker {WORKER_ID} claimed podcast {podcast_id} (attempt {podcast['attempts']})")
+
+    job = asyncio.create_task(generate_podcast_task(podcast_id))
+    beat = asyncio.create_task(heartbeat(podcast_id, job))
+    try:
+        await job
+    except asyncio.CancelledError:
+        pass
+    finally:
+        beat.cancel()
+        await release_podcast_job(podcast_id, WORKER_ID)
+        if tts_cache:
+            stats = tts_cache.stats()
+            print(
+                f"TTS cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+                f"{stats['evictions']} evictions, {stats['size_bytes'] / 2 ** 20:.1f} MB"
+            )
+
+async def main():
+    init_db()
+    await ensure_indexes(get_db())
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    health_checks = asyncio.create_task(tts_pool.run_health_checks(stopping))
+
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY)
+    running = set()
+
+    print(f"Worker {WORKER_ID} started with {WORKER_CONCURRENCY} slots")
+    while not stopping.is_set():
+        await slots.acquire()
+        if stopping.is_set():
+            slots.release()
+            break
+
+        await fail_exhausted_jobs()
+        # Series whose first episode was abandoned before sharing its structure
+        await fail_waiting_episodes()
+        # Refunds abandoned jobs, and jobs whose worker died before refunding them
+        await refund_failed_podcasts()
+        podcast = await claim_podcast_job(WORKER_ID)
+
+        if not podcast:
+            slots.release()
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=WORKER_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        task = asyncio.create_task(run_job(podcast))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: slots.release())
+
+    # Let in-flight jobs finish, unfinished ones are reclaimed once their lease expires
+    if running:
+        print(f"Waiting for {len(running)} running jobs to finish")
+        await asyncio.gather(*running, return_exceptions=True)
+    await health_checks
+    await close_clients()
+    await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,6 +6,7 @@ import {
   useToast,
   SimpleGrid,
   VStack,
+  Button,
 } from '@chakra-ui/react';
 import axios from '../api/axios';
 import PodcastForm from '../components/podcastGen/PodcastForm';
@@ -26,12 +27,18 @@ const GenPodcast: React.FC = () => {
   const [generatedPodcasts, setGeneratedPodcasts] = useState<Podcast[]>([]);
   const [currentPodcast, setCurrentPodcast] = useState<Podcast | null>(null);
   const [isLoading, setIsLoading] = useState(false);
+  // Cursor of the next page of podcasts, null once the last page is loaded
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [selectedLanguage, setSelectedLanguage] = useState(i18n.language.split('-')[0]);
   const toast = useToast();
 
-  const fetchPodcasts = async () => {
+  // Without a cursor the list restarts from the newest podcast, with one the page is appended
+  const fetchPodcasts = async (cursor?: string) => {
     try {
-      const response = await axios.get('/podcast/user-podcasts');
+      const response = await axios.get('/podcast/user-podcasts', {
+        params: cursor ? { cursor } : {}
+      });
       const podcastsWithCovers = await Promise.all(
         response.data.map(async (podcast: Podcast) => {
           try {
@@ -46,7 +53,8 @@ const GenPodcast: React.FC = () => {
           }
         })
       );
-      setGeneratedPodcasts(podcastsWithCovers);
+      setGeneratedPodcasts((previous) => (cursor ? [...previous, ...podcastsWithCovers] : podcastsWithCovers));
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error fetching podcasts:', error);
       toast({
@@ -63,6 +71,16 @@ const GenPodcast: React.FC = () => {
     fetchPodcasts();
   }, []);
 
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      await fetchPodcasts(nextCursor);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleGeneratePodcast = async (e: React.FormEvent) => {
     e.preventDefault();
     setIsLoading(true);
@@ -141,6 +159,17 @@ const GenPodcast: React.FC = () => {
               />
             ))}
           </SimpleGrid>
+          {nextCursor && (
+            <Button
+              alignSelf="center"
+              onClick={handleLoadMore}
+              isLoading={isLoadingMore}
+              colorScheme="green"
+              variant="outline"
+            >
+              {t('podcast.loadMore')}
+            </Button>
+          )}
         </VStack>
       </Container>
       {currentPodcast && (